@@ -4,7 +4,10 @@ from rich.text import Text
 
 from bqat import __name__ as name
 from bqat import __version__ as version
-from bqat.app import benchmark, filter, preprocess, report, run
+from bqat.app import benchmark, filter, merge, preprocess, report, run
+from bqat.discovery import parse_shard
+from bqat.executor import BACKENDS
+from bqat.report import REPORT_ENGINES, SAMPLING
 
 # from bqat.utils import menu
 
@@ -83,7 +86,7 @@ INPUT_TYPE = ["wsq", "jpg", "jpeg", "png", "bmp", "jp2"]
     "-A",
     is_flag=True,
     default=False,
-    help="Disable multithreading (For ARM64 platform).",
+    help="Run on a local process pool without Ray (For ARM64 platform).",
 )
 # @click.option(
 #     "--interactive",
@@ -125,6 +128,133 @@ INPUT_TYPE = ["wsq", "jpg", "jpeg", "png", "bmp", "jp2"]
     default="",
     help='Configure preprocessing task ("[target format],[target width],[color mode (grayscale, rgb)]").',
 )
+@click.option(
+    "--max-inflight",
+    type=int,
+    default=0,
+    help="Lower the number of scan batches in flight at once, two per worker by default (0 to keep the default).",
+)
+@click.option(
+    "--batch-size",
+    type=int,
+    default=0,
+    help="Number of files to score per task (0 to size batches automatically).",
+)
+@click.option(
+    "--output-format",
+    type=click.Choice(["csv", "parquet"], case_sensitive=False),
+    default="csv",
+    help="Output format, Parquet writes columnar row groups as results arrive.",
+)
+@click.option(
+    "--log-format",
+    type=click.Choice(["json", "jsonl"], case_sensitive=False),
+    default="json",
+    help="Log format, JSONL keeps one entry per line with a separate metadata file.",
+)
+@click.option(
+    "--resume",
+    default="",
+    help="Resume an interrupted job, skipping files already in its output (CSV or Parquet).",
+)
+@click.option(
+    "--cache",
+    default="",
+    help="Cache results by file content in this directory and reuse them across runs.",
+)
+@click.option(
+    "--cache-size",
+    type=int,
+    default=1024,
+    help="Maximum size of the result cache in MB, counted as the bytes of the cached results (JSON), not of the database file on disk.",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    default=False,
+    help="Only scan files added or modified since the last run and update its output.",
+)
+@click.option(
+    "--shard",
+    default="",
+    help="Only process shard INDEX/COUNT of the input (e.g. 0/4), merge the shard outputs with `--mode merge`.",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS, case_sensitive=False),
+    default="auto",
+    help="Execution backend, auto picks one by the number of input files.",
+)
+@click.option(
+    "--folder-batch",
+    type=int,
+    default=0,
+    help="Split speech folders with more files than this into sub-batches (0 to disable).",
+)
+@click.option(
+    "--ofiq-workers",
+    type=int,
+    default=1,
+    help="Split OFIQ input into this many chunks, each scored by its own OFIQ process.",
+)
+@click.option(
+    "--timeout",
+    type=float,
+    default=0,
+    help="Per-file deadline in seconds, files that miss it are retried in a fresh worker (0 to disable).",
+)
+@click.option(
+    "--retries",
+    type=int,
+    default=1,
+    help="Retries of a file that timed out or crashed its worker before it is quarantined.",
+)
+@click.option(
+    "--quarantine",
+    default="",
+    help="List of quarantined files: skipped on input, failing files are added to it.",
+)
+@click.option(
+    "--speculative",
+    is_flag=True,
+    default=False,
+    help="Re-run stragglers on idle workers near the end of a job.",
+)
+@click.option(
+    "--report-engine",
+    type=click.Choice(REPORT_ENGINES, case_sensitive=False),
+    default="auto",
+    help="Profile the output rows, or stream: report from statistics gathered while results are written (auto streams large outputs).",
+)
+@click.option(
+    "--report-sample",
+    type=int,
+    default=0,
+    help="Profile at most this many rows in reports, sampled from the output (0 for all rows).",
+)
+@click.option(
+    "--report-sampling",
+    type=click.Choice(SAMPLING, case_sensitive=False),
+    default="reservoir",
+    help="How report rows are sampled, stratified keeps the share of each group.",
+)
+@click.option(
+    "--report-stratify",
+    default="",
+    help="Column to stratify report samples by (parent folder of the file by default).",
+)
+@click.option(
+    "--report-minimal",
+    is_flag=True,
+    default=False,
+    help="Only compute minimal statistics in reports.",
+)
+@click.option(
+    "--report-budget",
+    type=float,
+    default=0,
+    help="Time budget of a report in seconds, falls back to minimal profiling when exceeded (0 for no limit).",
+)
 @click.option(
     "--debugging",
     default="false",
@@ -151,6 +281,28 @@ def main(
     engine,
     config,
     debugging,
+    max_inflight,
+    batch_size,
+    output_format,
+    log_format,
+    resume,
+    cache,
+    cache_size,
+    incremental,
+    shard,
+    backend,
+    folder_batch,
+    ofiq_workers,
+    timeout,
+    retries,
+    quarantine,
+    speculative,
+    report_engine,
+    report_sample,
+    report_sampling,
+    report_stratify,
+    report_minimal,
+    report_budget,
 ):
     console = Console()
     title = Text("\nWelcome to")
@@ -219,6 +371,7 @@ def main(
         "filter",
         "report",
         "preprocess",
+        "merge",
     ):
         click.echo(f">>> Mode [{mode}] not supported. Exit.\n")
         return
@@ -236,12 +389,30 @@ def main(
     convert_type = convert.split(",") if convert else []
     target_type = target
 
+    if shard:
+        try:
+            shard = parse_shard(shard)
+        except ValueError as e:
+            click.echo(f">>> {e}. Exit.\n")
+            return
+    else:
+        shard = None
+
+    report_options = {
+        "engine": report_engine.casefold(),
+        "sample": report_sample,
+        "sampling": report_sampling.casefold(),
+        "stratify": report_stratify,
+        "minimal": report_minimal,
+        "budget": report_budget,
+    }
+
     if mode == "filter":
-        filter(input, columns, query, sort, cwd)
+        filter(input, columns, query, sort, cwd, report_options)
         return
 
     if mode == "report":
-        report(input, cwd)
+        report(input, cwd, report_options)
         return
 
     if mode == "preprocess":
@@ -274,7 +445,11 @@ def main(
         except Exception as e:
             click.echo(f">>> Failed to parse configuration '{config}': {e}. Exit.\n")
             return
-        preprocess(input, output, debugging, configs)
+        preprocess(input, output, debugging, configs, shard, backend.casefold())
+        return
+
+    if mode == "merge":
+        merge(input, output, reporting, log_format.casefold(), report_options)
         return
 
     if not output:
@@ -282,7 +457,7 @@ def main(
 
     if benchmarking:
         mode = "face" if not mode else mode
-        benchmark(mode, limit, arm, engine)
+        benchmark(mode, limit, arm, engine, backend.casefold())
     elif mode:
         run(
             mode,
@@ -302,6 +477,23 @@ def main(
             cwd,
             engine,
             debugging,
+            max_inflight=max_inflight,
+            batch_size=batch_size,
+            log_format=log_format.casefold(),
+            output_format=output_format.casefold(),
+            resume=resume,
+            cache=cache,
+            cache_size=cache_size,
+            incremental=incremental,
+            shard=shard,
+            backend=backend.casefold(),
+            folder_batch=folder_batch,
+            ofiq_workers=ofiq_workers,
+            timeout=timeout,
+            retries=retries,
+            quarantine=quarantine,
+            speculative=speculative,
+            report_options=report_options,
         )
 
 
@@ -3,6 +3,8 @@ import glob
 import json
 import os
 import shutil
+import tempfile
+import threading
 import time
 import warnings
 from pathlib import Path
@@ -11,27 +13,42 @@ from zipfile import ZipFile
 
 import click
 import psutil
-import ray
 from cpuinfo import get_cpu_info
 from PIL import Image, ImageOps
 from rich.console import Console
-from rich.progress import MofNCompleteColumn, Progress, SpinnerColumn
 from rich.text import Text
 
 from bqat import __version__ as version
+from bqat.cache import ResultCache
+from bqat.discovery import FileDiscovery, discover, load_manifest, write_manifest
+from bqat.executor import (
+    AUTO_PROCESS,
+    TaskSupervisor,
+    get_executor,
+    resolve_backend,
+)
+from bqat.progress import LogFollower, progress_bar
+from bqat.sink import (
+    LogWriter,
+    ResultSink,
+    completed_files,
+    drop_files,
+    merge_outputs,
+    output_size,
+    read_log,
+)
+from bqat.stats import OutputStats
 from bqat.utils import (
+    BatchSizer,
     convert_ram,
     filter_output,
     generate_report,
-    glob_path,
+    is_output,
     validate_path,
-    write_csv,
-    write_log,
     write_report,
 )
 
 from .core.bqat_core import scan
-from .core.bqat_core.utils import extend
 
 
 def run(
@@ -53,14 +70,24 @@ def run(
     cwd: str,
     engine: str,
     debugging: bool,
+    max_inflight: int = 0,
+    batch_size: int = 0,
+    log_format: str = "json",
+    output_format: str = "csv",
+    resume: str = "",
+    cache: str = "",
+    cache_size: int = 1024,
+    incremental: bool = False,
+    shard: tuple = None,
+    backend: str = "auto",
+    folder_batch: int = 0,
+    ofiq_workers: int = 1,
+    timeout: float = 0,
+    retries: int = 1,
+    quarantine: str = "",
+    speculative: bool = False,
+    report_options: dict = None,
 ) -> None:
-    if not debugging:
-        ray.init(
-            configure_logging=True,
-            logging_level="error",
-            log_to_driver=False,
-        )
-
     warnings.simplefilter(action="ignore", category=FutureWarning)
     warnings.simplefilter(action="ignore", category=RuntimeWarning)
     warnings.simplefilter(action="ignore", category=UserWarning)
@@ -90,26 +117,90 @@ def run(
     else:
         input_folder = validate_path(input_folder)
 
-    file_total = 0
-    for ext in extend(TYPE):
-        file_total += len(
-            glob.glob(input_folder + f"**/{pattern}." + ext, recursive=True)
+    quarantined = []
+    quarantined_before = set()
+    if quarantine and os.path.exists(quarantine):
+        with open(quarantine) as f:
+            quarantined_before = {line.rstrip("\n") for line in f if line.strip()}
+
+    completed = set()
+    if resume:
+        resume = resume.rstrip("/")
+        if not is_output(resume):
+            click.echo(f">>> Output to resume not found ({resume}). Exit.\n")
+            return
+        if mode == "speech" or (mode == "face" and engine == "ofiq"):
+            click.echo(">>> Resume not supported for speech or OFIQ jobs. Exit.\n")
+            return
+        completed = completed_files(resume)
+        output_folder = str(Path(resume).parent)
+        output_format = "parquet" if resume.endswith(".parquet") else "csv"
+
+    previous, entries = None, {}
+    if incremental:
+        if resume:
+            click.echo(">>> Resume and incremental mode are exclusive. Exit.\n")
+            return
+        if mode == "speech" or (mode == "face" and engine == "ofiq"):
+            click.echo(">>> Incremental mode not supported for speech or OFIQ. Exit.\n")
+            return
+        manifest_dir = (
+            validate_path(output_folder) + f"manifest_{mode}{shard_tag(shard)}.jsonl"
         )
+        previous, entries = load_manifest(manifest_dir, input_folder, mode)
+        if previous and not is_output(previous["output"]):
+            previous, entries = None, {}
+        if previous:
+            output_format = (
+                "parquet" if previous["output"].endswith(".parquet") else "csv"
+            )
+        limit = 0
+
+    discovery = FileDiscovery(
+        input_folder,
+        TYPE,
+        pattern,
+        limit,
+        exclude=[output_folder],
+        skip=completed | quarantined_before,
+        manifest=entries if incremental else None,
+        shard=shard,
+    ).start()
 
     metadata.append("\nInput Directory: ")
     metadata.append(input_folder, style="bold yellow")
-    metadata.append(" (")
-    metadata.append(str(file_total), style="bold yellow")
-    metadata.append(" samples)\n")
+    metadata.append("\n")
     console.print(metadata)
 
     if limit:
         click.echo(f"Scan number limit: {limit}")
-        if limit < file_total:
-            file_total = limit
-
-    if file_total == 0:
-        click.echo(">>> No valid input found. Exit.\n")
+    if shard:
+        click.echo(f"Shard: {shard[0]}/{shard[1]}")
+    if resume:
+        click.echo(f"Resume from: {resume} ({len(completed)} completed)")
+
+    source = discovery
+    removed = set()
+    if incremental:
+        # Settle the whole tree first: deleted files are only known at the end.
+        source = list(discovery)
+        removed = entries.keys() - discovery.seen.keys()
+        removed.update(path for path in source if path in entries)
+        click.echo(
+            f"Incremental: {len(source)} new or modified, "
+            f"{len(entries.keys() - discovery.seen.keys())} deleted, "
+            f"{discovery.skipped} unchanged"
+        )
+        if not source and not removed:
+            click.echo(">>> No changes since last run. Exit.\n")
+            discovery.stop()
+            return
+    elif not discovery.wait():
+        if discovery.skipped:
+            click.echo(">>> All input already processed. Exit.\n")
+        else:
+            click.echo(">>> No valid input found. Exit.\n")
+        discovery.stop()
         return
 
     # if log_dir.rfind(".") == -1:
@@ -122,192 +213,228 @@ def run(
     dt = datetime.datetime.today()
     timestamp = f"{dt.day}-{dt.month}-{dt.year}_{dt.hour}-{dt.minute}-{dt.second}"
     output_folder = validate_path(output_folder)
-    output_dir = output_folder + f"output_{mode}_{timestamp}.csv"
-    log_dir = output_folder + f"log_{mode}_{timestamp}.json"
-    report_dir = output_folder + f"report_{mode}_{timestamp}.html"
-
-    write_log(log_dir, init=True)
-
-    file_globs = []
-    for ext in extend(TYPE):
-        file_globs.append(
-            glob.iglob(input_folder + f"**/{pattern}." + ext, recursive=True)
-        )
+    tag = shard_tag(shard)
+    output_dir = output_folder + f"output_{mode}_{timestamp}{tag}.{output_format}"
+    if resume:
+        output_dir = resume
+    if previous:
+        output_dir = previous["output"]
+        # Rows of an interrupted incremental run were never added to the manifest,
+        # only look for them when the output changed since the manifest was saved.
+        if previous.get("size") != output_size(output_dir):
+            removed.update(completed_files(output_dir) - entries.keys())
+        if removed:
+            drop_files(output_dir, removed)
+    log_dir = output_folder + f"log_{mode}_{timestamp}{tag}.{log_format}"
+    report_dir = output_folder + f"report_{mode}_{timestamp}{tag}.html"
+
+    sink = ResultSink(
+        output_dir, log_dir, log_format, output_format, stats=OutputStats()
+    )
 
     file_count = 0
     failed = 0
     tasks = []
+    cache_config = {"path": cache, "max_size": cache_size << 20} if cache else None
+    cache_hits = cache_misses = 0
+
+    if mode == "face" and engine == "ofiq":
+        if ofiq_workers > 1 and backend in ("auto", "thread"):
+            backend = "process"  # each OFIQ chunk runs in its own working folder
+        backend = "thread" if backend == "auto" else backend
+    elif single:
+        # No Ray on ARM64, fan out over a local process pool instead.
+        backend = "process" if backend in ("auto", "ray") else backend
+    elif mode != "speech" and backend == "auto":
+        discovery.wait(AUTO_PROCESS + 1)
+        backend = resolve_backend(backend, discovery.count)
+    if timeout and backend in ("thread", "serial") and mode != "speech":
+        backend = "process"  # hung tasks can only be stopped in a separate process
+    if single or mode != "speech":
+        click.echo(f"Backend: {backend}")
 
     if mode == "face" and engine == "ofiq":
-        with Progress(
-            SpinnerColumn(), MofNCompleteColumn(), *Progress.get_default_columns()
-        ) as p:
+        files = list(discovery)
+        file_total = len(files)
+        chunks = max(1, min(ofiq_workers, file_total))
+        # A shard only holds some of the files, so OFIQ must not see the rest.
+        if chunks > 1 or shard:
+            staging = [
+                stage_files(files[index::chunks], input_folder)
+                for index in range(chunks)
+            ]
+            ofiq_logs = [Path(folder) / "ofiq.log" for folder in staging]
+        else:
+            staging = []
+            ofiq_logs = [Path("ofiq.log")]
+        executor = get_executor(backend, debugging, chunks)
+        followers = [LogFollower(path) for path in ofiq_logs]
+        with progress_bar() as p:
             task_progress = p.add_task("[purple]Processing...", total=file_total)
-            tasks.append(
-                scan_task.remote(
-                    input_folder,
-                    output_dir,
-                    log_dir,
-                    mode,
-                    convert,
-                    target,
-                    engine,
+            for folder in staging or [input_folder]:
+                tasks.append(
+                    executor.submit(
+                        scan_task,
+                        folder,
+                        mode,
+                        engine,
+                        folder if staging else None,
+                    )
                 )
-            )
-            _, not_ready = ray.wait(tasks, timeout=3)
-            while len(not_ready) != 0:
-                count = 0
-                if not Path("ofiq.log").exists():
-                    continue
-                with open("ofiq.log") as lines:
-                    count = len([1 for _ in lines])
-                    count //= 34
-                advance = count - file_count
-                if advance > 0:
-                    file_count = count
-                    p.update(task_progress, advance=advance)
-                _, not_ready = ray.wait(not_ready, timeout=3)
-                if p.finished:
-                    break
+            not_ready = tasks
+            while not_ready:
+                _, not_ready = executor.wait(not_ready, timeout=1)
+                count = sum(follower.poll() for follower in followers)
+                p.update(task_progress, completed=min(count, file_total))
             file_count = file_total
             p.update(task_progress, completed=file_count)
-        ray.get(not_ready)
+        for folder, task in zip(staging or [None], tasks):
+            results, logs = executor.result(task)
+            if folder:
+                unstage(results, folder, input_folder)
+                shutil.rmtree(folder, ignore_errors=True)
+            sink.write(results, logs)
+        executor.shutdown()
 
         # TODO: locale not configurable, UTC hardcoded.
         Console().log("[bold][red]Finished!")
     else:
-        if single:
-            with Progress(
-                SpinnerColumn(), MofNCompleteColumn(), *Progress.get_default_columns()
-            ) as p:
-                task_progress = p.add_task("[purple]Processing...", total=file_total)
-                for files in file_globs:
-                    for path in files:
-                        result = scan(
-                            path,
-                            mode=mode,
-                            source=convert,
-                            target=target,
-                            type="file",
-                            engine=engine,
-                        )
-
-                        log = {}
-                        if result.get("converted"):
-                            log = {"convert": result.get("converted")}
-                            log.update({"file": path})
-                            write_log(log_dir, log)
-                            result.pop("converted")
-                        if result.get("log"):
-                            log = result.pop("log")
-                            log.update({"file": path})
-                            write_log(log_dir, log)
-
-                        if not log.get("load image"):
-                            write_csv(output_dir, result)
-
-                        file_count += 1
-                        p.update(task_progress, advance=1)
-                        if p.finished:
-                            break
-                    if p.finished:
-                        break
-            Console().log("[bold][red]Finished!")
-        else:
-            if mode != "speech":
-                with Progress(
-                    SpinnerColumn(),
-                    MofNCompleteColumn(),
-                    *Progress.get_default_columns(),
-                ) as p:
-                    task_progress = p.add_task(
-                        "[cyan]Sending task...", total=file_total
-                    )
-                    for files in file_globs:
-                        for path in files:
-                            tasks.append(
-                                scan_task.remote(
-                                    path,
-                                    output_dir,
-                                    log_dir,
-                                    mode,
-                                    convert,
-                                    target,
-                                    engine,
-                                )
-                            )
-                            file_count += 1
-                            p.update(task_progress, advance=1)
-                            if p.finished:
-                                break
-                        if p.finished:
-                            break
-
-                        # # Load limiter
-                        # if len(tasks) > 1000:
-                        #     ready = len(tasks) - 1000
-                        #     ray.wait(tasks, num_returns=ready)
-
-                eta_step = 10  # ETA estimation interval
-                ready, not_ready = ray.wait(tasks)
-
-                with Progress(
-                    SpinnerColumn(),
-                    MofNCompleteColumn(),
-                    *Progress.get_default_columns(),
-                ) as p:
-                    task_progress = p.add_task("[cyan]Processing...", total=file_total)
-                    while not p.finished:
-                        if len(not_ready) < eta_step:
-                            p.update(task_progress, completed=file_total)
+        if mode != "speech" or single:
+            with progress_bar() as p:
+                task_progress = p.add_task("[cyan]Processing...", total=None)
+                sizer = BatchSizer(batch_size)
+                executor = get_executor(backend, debugging)
+                workers = executor.workers
+                capacity = workers * 2  # keep one batch queued per worker
+                if max_inflight:
+                    capacity = min(capacity, max_inflight)
+                supervisor = TaskSupervisor(
+                    executor,
+                    scan_batch,
+                    (mode, convert, target, engine, cache_config),
+                    timeout,
+                    retries,
+                    speculative,
+                )
+
+                def collect(num_returns=0):
+                    nonlocal cache_hits, cache_misses
+                    for batch, value, error in supervisor.collect(num_returns):
+                        if error:
+                            quarantined.extend(batch)
+                            log = {"file": batch[0], "task error": error}
+                            sink.write(logs=[dict(log, quarantined=True)])
+                            p.update(task_progress, total=discovery.count, advance=1)
                             continue
-                        tasks = not_ready
-                        ready, not_ready = ray.wait(tasks, num_returns=eta_step)
-                        p.update(task_progress, advance=len(ready))
+                        count, elapsed, results, logs, hits, misses = value
+                        sink.write(results, logs)
+                        sizer.update(count, elapsed)
+                        cache_hits += hits
+                        cache_misses += misses
+                        p.update(task_progress, total=discovery.count, advance=count)
+
+                def submit(batch):
+                    # Load limiter
+                    if supervisor.pending >= capacity:
+                        collect(supervisor.pending - capacity + 1)
+                    supervisor.submit(batch)
+
+                batch = []
+                for path in source:
+                    batch.append(path)
+                    file_count += 1
+                    if len(batch) < sizer.size:
+                        continue
+                    submit(batch)
+                    batch = []
+                    if not sizer.calibrated and supervisor.pending >= workers:
+                        collect(1)
+                if batch:
+                    submit(batch)
+
+                supervisor.draining = True
+                while supervisor.pending:
+                    collect()
+                executor.shutdown()
 
-                ray.get(not_ready)
-                Console().log("[bold][red]Finished!")
-            else:
-                dir_list = [
-                    i
-                    for i in Path(input_folder).rglob("*")
-                    if (i.is_dir() and glob_path(i, TYPE))
-                ]
-                if glob_path(input_folder, TYPE, recursive=False):
-                    dir_list.append(Path(input_folder))
-                with Progress(
-                    SpinnerColumn(),
-                    MofNCompleteColumn(),
-                    *Progress.get_default_columns(),
-                ) as p:
-                    task_progress = p.add_task("[cyan]Processing...", total=file_total)
-                    for dir in dir_list:
-                        ready = 0
-                        try:
-                            output = scan(dir, mode=mode, type="folder")
-                            if output.get("log"):
-                                log = output.pop("log")
-                                log.update({"directory": str(dir)})
-                                write_log(log_dir, log)
-                            result_list = output["results"]
-                            for result in result_list:
-                                ready += 1
-                                write_csv(output_dir, result)
-                        except Exception as e:
-                            ready = len(glob_path(str(dir), TYPE, recursive=False))
+            Console().log("[bold][red]Finished!")
+        else:
+            dir_list = {}
+            for path in discovery:
+                dir_list.setdefault(Path(path).parent, []).append(path)
+            file_total = discovery.count
+            jobs = []
+            for dir, files in dir_list.items():
+                if folder_batch and len(files) > folder_batch:
+                    for index in range(0, len(files), folder_batch):
+                        jobs.append((dir, files[index : index + folder_batch]))
+                elif shard:
+                    # Files of other shards share the folder, stage ours only.
+                    jobs.append((dir, files))
+                else:
+                    jobs.append((dir, None))
+            if backend == "auto":
+                backend = resolve_backend(backend, file_total)
+            click.echo(f"Backend: {backend}")
+            executor = get_executor(backend, debugging)
+            owner = {}
+            for dir, files in jobs:
+                task = executor.submit(speech_task, str(dir), mode, files)
+                owner[task] = (dir, len(files) if files else len(dir_list[dir]))
+                tasks.append(task)
+            with progress_bar() as p:
+                task_progress = p.add_task("[cyan]Processing...", total=file_total)
+                while tasks:
+                    done, tasks = executor.completed(tasks)
+                    for task in done:
+                        dir, count = owner.pop(task)
+                        result_list, logs, error = executor.result(task)
+                        if error is None:
+                            ready = len(result_list)
+                            sink.write(result_list, logs)
+                        else:
+                            ready = count
                             failed += ready
-                            error = json.loads(str(e))
                             log = {
                                 "directory": str(dir),
                                 "file count": ready,
                                 "error": error,
                             }
-                            write_log(log_dir, log)
+                            sink.write(logs=[log])
                         p.update(task_progress, advance=ready)
                         file_count += ready
-                        if p.finished:
-                            break
-                Console().log("[bold][red]Finished!")
+            executor.shutdown()
+            Console().log("[bold][red]Finished!")
+
+    try:
+        sink.close()
+        if quarantined:
+            quarantine = quarantine or (
+                output_folder + f"quarantine_{mode}_{timestamp}{tag}.txt"
+            )
+            with open(quarantine, "a") as f:
+                f.writelines(f"{path}\n" for path in quarantined)
+        if incremental:
+            write_manifest(
+                manifest_dir,
+                {
+                    "input": input_folder,
+                    "mode": mode,
+                    "output": output_dir,
+                    "size": output_size(output_dir),
+                    "datetime": str(dt),
+                },
+                discovery.seen,
+            )
+    except Exception as e:
+        click.echo(f"failed to write results: {str(e)}")
+
+    if cache_config:
+        try:
+            # Workers only evict every so many puts, hold the size limit here.
+            ResultCache(**cache_config).close()
+        except Exception as e:
+            click.echo(f"failed to evict cache: {str(e)}")
 
     job_timer = time.time() - job_timer
     sc = job_timer
@@ -315,46 +442,37 @@ def run(
     hr, mn = divmod(mn, 60)
     sc, mn, hr = int(sc), int(mn), int(hr)
 
+    failed_count = failed if failed else sink.log.failed
     try:
-        write_log(log_dir, finish=True)
-        log_out = {
-            "metadata": {
+        sink.log.close(
+            {
                 "version": "BQAT v" + version,
                 "datetime": str(dt),
                 "input directory": input_folder,
+                "shard": f"{shard[0]}/{shard[1]}" if shard else None,
                 "processed": file_count,
-                "failed": 0,
-                "log": None,
+                "failed": failed_count,
+                "log": sink.log.entries,
                 "process time": f"{hr}h{mn}m{sc}s",
             }
-        }
-        with open(log_dir, "r") as f:
-            logs = json.load(f)
-            log_out["metadata"].update({"log": len(logs)})
-            log_out["log"] = logs
-            log_out["metadata"]["failed"] = (
-                failed_count := len([item for item in logs if item.get("load image")])
-                if not failed
-                else failed
-            )
-        with open(log_dir, "w") as f:
-            json.dump(log_out, f)
+        )
     except Exception as e:
-        click.echo(f"failed to reload metadata for log: {str(e)}")
+        click.echo(f"failed to write metadata for log: {str(e)}")
 
-    if file_count == failed_count:
+    if file_count == failed_count and not previous:
         output_dir = None
         report_dir = None
 
-    try:
-        if output_dir:
-            write_csv(output_dir, seam=True)
-    except Exception as e:
-        click.echo(f"failed to seam output: {str(e)}")
-
     try:
         if output_dir and reporting:
-            write_report(report_dir, output_dir, f"EDA Report (BQAT v{version})")
+            write_report(
+                report_dir,
+                output_dir,
+                f"EDA Report (BQAT v{version})",
+                report_options,
+                # Running statistics only cover rows written by this run.
+                sink.stats if not (resume or previous) else None,
+            )
         else:
             report_dir = None
     except Exception as e:
@@ -363,7 +481,9 @@ def run(
 
     try:
         if output_dir and (attributes or query or sort):
-            dir = filter_output(output_dir, attributes, query, sort, cwd)
+            dir = filter_output(
+                output_dir, attributes, query, sort, cwd, report_options
+            )
             outlier_filter = (
                 {"Output": dir.get("output"), "Report": dir.get("report")}
                 if dir
@@ -388,6 +508,22 @@ def run(
             "Log": log_dir,
         },
     }
+    if resume:
+        summary["Assessment Task"].update({"Skipped": discovery.skipped})
+    if incremental:
+        summary["Assessment Task"].update(
+            {"Unchanged": discovery.skipped, "Removed": len(removed)}
+        )
+    if shard:
+        summary["Assessment Task"].update({"Shard": f"{shard[0]}/{shard[1]}"})
+    if quarantined:
+        summary["Assessment Task"].update(
+            {"Quarantined": len(quarantined), "Quarantine": quarantine}
+        )
+    if cache:
+        summary.update({"Cache": {"Hits": cache_hits, "Misses": cache_misses}})
+    if sink.log.meta_path:
+        summary["Assessment Task"].update({"Log Metadata": str(sink.log.meta_path)})
     if outlier_filter:
         summary.update({"Outlier Filter": outlier_filter})
 
@@ -395,9 +531,9 @@ def run(
     print("\n>> Finished <<\n")
 
 
-def filter(output, attributes, query, sort, cwd):
+def filter(output, attributes, query, sort, cwd, report_options=None):
     try:
-        dir = filter_output(output, attributes, query, sort, cwd)
+        dir = filter_output(output, attributes, query, sort, cwd, report_options)
         outlier_filter = (
             {
                 "Table": dir.get("table"),
@@ -419,14 +555,10 @@ def filter(output, attributes, query, sort, cwd):
     return dir
 
 
-def benchmark(mode: str, limit: int, single: bool, engine: str) -> None:
+def benchmark(
+    mode: str, limit: int, single: bool, engine: str, backend: str = "auto"
+) -> None:
     """Run benchmark to profile the capability of host system."""
-    ray.init(
-        configure_logging=True,
-        logging_level="error",
-        log_to_driver=False,
-    )
-
     console = Console()
     metadata = Text(">> Benchmarking Started <<")
     metadata.append("\n\nMode: ")
@@ -454,35 +586,25 @@ def benchmark(mode: str, limit: int, single: bool, engine: str) -> None:
     input_dir = samples.rstrip(".zip") + "/"
 
     batch = 99
-    file_total = 0
     file_count = 0
     tasks = []
-    file_globs = []
     test_timer = time.time()
-    for ext in extend(TYPE):
-        file_total += len(glob.glob(input_dir + "**/*." + ext, recursive=True))
-    for ext in extend(TYPE):
-        file_globs.append(glob.iglob(input_dir + "**/*." + ext, recursive=True))
+    files = discover(input_dir, TYPE)
+    file_total = len(files)
 
     if not single:
         file_total += file_total * batch
         if mode == "face" and engine == "ofiq":
-            for files in file_globs:
-                for path in files:
-                    path = Path(path)
-                    for i in range(batch):
-                        shutil.copy(path, path.parent / f"{i}_{path.name}")
+            for path in files:
+                for i in range(batch):
+                    shutil.copy(path, path.parent / f"{i}_{path.name}")
         elif mode != "iris":
-            for _ in range(batch):
-                for ext in extend(TYPE):
-                    file_globs.append(
-                        glob.iglob(input_dir + "**/*." + ext, recursive=True)
-                    )
+            files = files * (batch + 1)
         else:
             for i in range(batch):
                 with ZipFile(samples, "r") as z:
                     z.extractall(f"{input_dir}batch_{i}/")
-            file_globs.append(glob.iglob(input_dir + "**/*." + ext, recursive=True))
+            files = discover(input_dir, TYPE)
 
     metadata.append("\nInput: ")
     metadata.append(input_dir, style="bold yellow")
@@ -494,106 +616,65 @@ def benchmark(mode: str, limit: int, single: bool, engine: str) -> None:
     if limit:
         click.echo(f"Scan number limit: {limit}")
         file_total = limit
+        files = files[:limit]
+
+    if mode == "face" and engine == "ofiq":
+        backend = "thread" if backend == "auto" else backend
+    elif single:
+        backend = "process" if backend in ("auto", "ray") else backend
+    else:
+        backend = resolve_backend(backend, len(files))
+    if single or mode != "speech":
+        click.echo(f"Backend: {backend}")
 
     if mode == "face" and engine == "ofiq":
-        with Progress(
-            SpinnerColumn(), MofNCompleteColumn(), *Progress.get_default_columns()
-        ) as p:
+        executor = get_executor(backend)
+        follower = LogFollower("ofiq.log")
+        with progress_bar() as p:
             task_progress = p.add_task("[purple]Processing...", total=file_total)
-            tasks.append(
-                benchmark_task.remote(
-                    input_dir,
-                    mode,
-                    engine,
-                )
-            )
-            _, not_ready = ray.wait(tasks, timeout=3)
-            while len(not_ready) != 0:
-                count = 0
-                if not Path("ofiq.log").exists():
-                    continue
-                with open("ofiq.log") as lines:
-                    count = len([1 for _ in lines])
-                    count //= 34
-                advance = count - file_count
-                if advance > 0:
-                    file_count = count
-                    p.update(task_progress, advance=advance)
-                _, not_ready = ray.wait(not_ready, timeout=3)
-                if p.finished:
-                    break
+            tasks.append(executor.submit(benchmark_task, input_dir, mode, engine))
+            not_ready = tasks
+            while not_ready:
+                _, not_ready = executor.wait(not_ready, timeout=1)
+                p.update(task_progress, completed=min(follower.poll(), file_total))
             file_count = file_total
             p.update(task_progress, completed=file_count)
-        ray.get(not_ready)
+        for task in tasks:
+            executor.result(task)
+        executor.shutdown()
 
         Console().log("[bold][red]Finished!")
     else:
-        if single:
-            with Progress(
-                SpinnerColumn(), MofNCompleteColumn(), *Progress.get_default_columns()
-            ) as p:
-                task_progress = p.add_task("[purple]Processing...", total=file_total)
-                for files in file_globs:
-                    for path in files:
-                        scan(path, mode=mode, type="file", engine=engine)
-                        file_count += 1
-                        p.update(task_progress, advance=1)
-                        if p.finished:
-                            break
-                    if p.finished:
-                        break
-
-        else:
-            if mode != "speech":
-                with Progress(
-                    SpinnerColumn(),
-                    MofNCompleteColumn(),
-                    *Progress.get_default_columns(),
-                ) as p:
-                    task_progress = p.add_task(
-                        "[cyan]Sending task...", total=file_total
-                    )
-                    for files in file_globs:
-                        for path in files:
-                            file_count += 1
-                            p.update(task_progress, advance=1)
-                            tasks.append(benchmark_task.remote(path, mode, engine))
-                            if p.finished:
-                                break
-                        if p.finished:
-                            break
-
-                eta_step = 10  # ETA estimation interval
-                ready, not_ready = ray.wait(tasks)
-
-                with Progress(
-                    SpinnerColumn(),
-                    MofNCompleteColumn(),
-                    *Progress.get_default_columns(),
-                ) as p:
-                    task_progress = p.add_task(
-                        "[cyan]Processing...\n", total=file_total
+        if mode != "speech" or single:
+            executor = get_executor(backend)
+            with progress_bar() as p:
+                task_progress = p.add_task("[cyan]Sending task...", total=file_total)
+                for path in files:
+                    file_count += 1
+                    p.update(task_progress, advance=1)
+                    tasks.append(
+                        executor.submit(benchmark_task, str(path), mode, engine)
                     )
-                    while not p.finished:
-                        if len(not_ready) < eta_step:
-                            p.update(task_progress, completed=file_total)
-                            continue
-                        tasks = not_ready
-                        ready, not_ready = ray.wait(tasks, num_returns=eta_step)
-                        p.update(task_progress, advance=len(ready))
 
-                ray.get(tasks)
-            else:
-                try:
-                    input_file = glob.glob(input_dir + "*.wav")[0]
-                    for index in range(batch):
-                        shutil.copy(input_file, input_dir + f"input_file_{index}.wav")
-                    with Console().status("[bold green]Processing data...") as _:
-                        out = scan(input_dir, mode=mode, type="folder")
-                        file_count += len(out.get("results"))
-                    Console().log("[bold][red]Finished!")
-                except Exception as e:
-                    print(str(e))
+            with progress_bar() as p:
+                task_progress = p.add_task("[cyan]Processing...\n", total=file_total)
+                while tasks:
+                    ready, tasks = executor.completed(tasks)
+                    for task in ready:
+                        executor.result(task)
+                    p.update(task_progress, advance=len(ready))
+            executor.shutdown()
+        else:
+            try:
+                input_file = glob.glob(input_dir + "*.wav")[0]
+                for index in range(batch):
+                    shutil.copy(input_file, input_dir + f"input_file_{index}.wav")
+                with Console().status("[bold green]Processing data...") as _:
+                    out = scan(input_dir, mode=mode, type="folder")
+                    file_count += len(out.get("results"))
+                Console().log("[bold][red]Finished!")
+            except Exception as e:
+                print(str(e))
 
     shutil.rmtree(input_dir)
 
@@ -626,61 +707,160 @@ def benchmark(mode: str, limit: int, single: bool, engine: str) -> None:
     print("\n>> Benchmarking Finished <<\n")
 
 
-@ray.remote
-def scan_task(path, output_dir, log_dir, mode, convert, target, engine):
-    if engine != "ofiq":
+def scan_file(path, mode, convert, target, engine, cache=None) -> tuple:
+    """Score one file, returns the result row (None if failed) and log entries."""
+    key = None
+    if cache is not None and not convert:
         try:
-            result = scan(path, mode=mode, source=convert, target=target, engine=engine)
+            key = cache.key(path, mode, engine, target)
+            if (cached := cache.get(key, path)) is not None:
+                return cached
         except Exception as e:
-            print(f">>>> Scan task error: {str(e)}")
-            write_log(log_dir, {"file": path, "task error": str(e)})
-            return
+            print(f">>>> Cache error: {str(e)}")
+            key = None
 
-        log = {}
-        if result.get("converted"):
-            log = {"convert": result.get("converted")}
-            log.update({"file": path})
-            write_log(log_dir, log)
-            result.pop("converted")
-        if result.get("log"):
-            log = result.pop("log")
-            log.update({"file": path})
-            write_log(log_dir, log)
-
-        if not log.get("load image"):
-            write_csv(output_dir, result)
-    else:
+    try:
+        result = scan(path, mode=mode, source=convert, target=target, engine=engine)
+    except Exception as e:
+        print(f">>>> Scan task error: {str(e)}")
+        return None, [{"file": path, "task error": str(e)}]
+
+    logs = []
+    log = {}
+    if result.get("converted"):
+        log = {"convert": result.get("converted")}
+        log.update({"file": path})
+        logs.append(log)
+        result.pop("converted")
+    if result.get("log"):
+        log = result.pop("log")
+        log.update({"file": path})
+        logs.append(log)
+
+    if log.get("load image"):
+        result = None
+    if key:
         try:
-            result = scan(path, mode=mode, engine=engine)
+            cache.put(key, result, logs)
         except Exception as e:
-            print(f">>>> Scan task error: {str(e)}")
-            write_log(log_dir, {"folder": path, "task error": str(e)})
-            return
+            print(f">>>> Cache error: {str(e)}")
+    return result, logs
+
+
+def scan_task(path, mode, engine, workdir=None) -> tuple:
+    """Score a whole folder in one OFIQ run, returns (results, logs)."""
+    cwd = os.getcwd()
+    try:
+        if workdir:
+            os.chdir(workdir)  # keep the ofiq.log of each chunk apart
+        result = scan(path, mode=mode, engine=engine)
+    except Exception as e:
+        print(f">>>> Scan task error: {str(e)}")
+        return [], [{"folder": path, "task error": str(e)}]
+    finally:
+        os.chdir(cwd)
+
+    logs = []
+    if result.get("log"):
+        log = result.pop("log")
+        log.update({"folder": path})
+        logs.append(log)
+
+    return result.get("results"), logs
+
+
+_worker = threading.local()
 
-        log = {}
-        if result.get("log"):
-            log = result.pop("log")
-            log.update({"folder": path})
-            write_log(log_dir, log)
 
-        result_list = result.get("results")
-        for result in result_list:
-            write_csv(output_dir, result)
+def stage_files(files: list, root: str) -> str:
+    """Symlink `files` into a new staging folder, keeping paths relative to `root`."""
+    staging = tempfile.mkdtemp(prefix="bqat_")
+    for file in files:
+        link = Path(staging) / os.path.relpath(file, root)
+        link.parent.mkdir(parents=True, exist_ok=True)
+        os.symlink(os.path.abspath(file), link)
+    return staging
+
+
+def unstage(results: list, staging: str, root: str) -> None:
+    """Map the `file` entries of results scored in a staging folder back to `root`."""
+    root = validate_path(root)
+    for result in results:
+        file = str(result.get("file", ""))
+        if file.startswith(staging):
+            result["file"] = root + file[len(staging) :].lstrip("/")
+
+
+def speech_task(folder, mode, files=None) -> tuple:
+    """Score a speech folder, or only `files` of it, returns (results, logs, error).
+
+    A sub-batch of a large folder is scored from a staging folder of
+    symlinks, and the result paths are mapped back to the original folder.
+    """
+    staging = stage_files(files, folder) if files else None
+    try:
+        output = scan(staging or folder, mode=mode, type="folder")
+        logs = []
+        if output.get("log"):
+            log = output.pop("log")
+            log.update({"directory": folder})
+            logs.append(log)
+        results = output["results"]
+        if staging:
+            unstage(results, staging, folder)
+        return results, logs, None
+    except Exception as e:
+        try:
+            error = json.loads(str(e))
+        except ValueError:
+            error = str(e)
+        return [], [], error
+    finally:
+        if staging:
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+def scan_batch(paths, mode, convert, target, engine, cache=None) -> tuple:
+    """Score a batch of files in a worker.
+
+    Returns (count, elapsed, results, logs, cache hits, cache misses). The
+    result cache is opened once per worker process and kept for the
+    following batches, like the engine state `scan()` sets up on first use.
+    Results are returned to the driver, which owns all output files.
+    """
+    timer = time.time()
+    local_cache = None
+    if cache:
+        caches = _worker.__dict__.setdefault("caches", {})
+        key = tuple(sorted(cache.items()))
+        if key not in caches:
+            caches[key] = ResultCache(**cache)
+        local_cache = caches[key]
+    hits, misses = (local_cache.hits, local_cache.misses) if local_cache else (0, 0)
+    results, logs = [], []
+    for path in paths:
+        result, log = scan_file(path, mode, convert, target, engine, local_cache)
+        if result:
+            results.append(result)
+        logs.extend(log)
+    if local_cache:
+        local_cache.flush()
+        hits, misses = local_cache.hits - hits, local_cache.misses - misses
+    return len(paths), time.time() - timer, results, logs, hits, misses
 
 
-@ray.remote
 def benchmark_task(path: str, mode: str, engine: str) -> None:
     if mode == "finger":
         scan(
             path, mode=mode, source="na", target="na"
         )  # Specify a dummy type so no conversion
     else:
-        print(scan(path, mode=mode, engine=engine))
+        scan(path, mode=mode, engine=engine)
 
 
-def report(input, cwd):
+def report(input, cwd, report_options=None):
     try:
-        dir = generate_report(input, cwd)
+        dir = generate_report(input, cwd, report_options)
         report = (
             {"Table": dir.get("table"), "Report": dir.get("report")} if dir else False
         )
@@ -696,17 +876,180 @@ def report(input, cwd):
     return dir
 
 
-def preprocess(input_dir: str, output_dir: str, debugging: bool, config: dict) -> str:
-    if not debugging:
-        ray.init(
-            configure_logging=True,
-            logging_level="error",
-            log_to_driver=False,
+def shard_tag(shard: tuple) -> str:
+    return f"_shard-{shard[0]}-of-{shard[1]}" if shard else ""
+
+
+def shard_key(path) -> tuple:
+    """(mode, count, index) of a shard output or log from its name."""
+    name = Path(path).name.split(".")[0]
+    index, _, count = name.rpartition("_shard-")[2].partition("-of-")
+    return name.split("_")[1], int(count), int(index)
+
+
+def latest_shards(paths: list, prefer: dict = None) -> dict:
+    """Pick one file per shard, the newest when a shard was run more than once.
+
+    With `prefer` (shard to output path), a file from the same run as the
+    preferred one (same timestamp in its name) wins over newer ones.
+    """
+    shards = {}
+    for path in paths:
+        shards.setdefault(shard_key(path), []).append(path)
+    chosen = {}
+    for key, files in shards.items():
+        # Copied outputs carry the copy time, the name carries the run time.
+        files.sort(key=run_time)
+        chosen[key] = files[-1]
+        if prefer and key in prefer:
+            stamp = run_stamp(prefer[key])
+            chosen[key] = next(
+                (path for path in files if run_stamp(path) == stamp), files[-1]
+            )
+        if len(files) > 1 and not prefer:
+            click.echo(
+                f"Shard {key[2]}/{key[1]} found {len(files)} times, "
+                f"using the newest: {Path(chosen[key]).name}"
+            )
+    return chosen
+
+
+def run_stamp(path) -> str:
+    """Timestamp part of an output or log name ({kind}_{mode}_{stamp}_shard-...)."""
+    name = Path(path).name.split(".")[0].rpartition("_shard-")[0]
+    return name.split("_", 2)[2]
+
+
+def run_time(path) -> datetime.datetime:
+    """Start time of the run that wrote an output or log, from its name."""
+    try:
+        return datetime.datetime.strptime(run_stamp(path), "%d-%m-%Y_%H-%M-%S")
+    except ValueError:
+        return datetime.datetime.min
+
+
+def merge(
+    input_folder: str,
+    output_folder: str,
+    reporting: bool,
+    log_format: str = "json",
+    report_options: dict = None,
+) -> dict:
+    """Combine the outputs and logs of a sharded job into one result set."""
+    job_timer = time.time()
+    input_folder = validate_path(input_folder)
+    outputs = sorted(
+        glob.glob(input_folder + "output_*_shard-*.csv")
+        + glob.glob(input_folder + "output_*_shard-*.parquet")
+    )
+    logs = sorted(
+        path
+        for path in glob.glob(input_folder + "log_*_shard-*.json*")
+        if not path.endswith(".meta.json")
+    )
+    if not outputs:
+        click.echo(f">>> No sharded output found ({input_folder}). Exit.\n")
+        return {}
+
+    if len({Path(path).suffix for path in outputs}) > 1:
+        click.echo(">>> Cannot merge CSV and Parquet outputs together. Exit.\n")
+        return {}
+    outputs = latest_shards(outputs)
+    if len({key[:2] for key in outputs}) > 1:
+        click.echo(f">>> Outputs of different jobs found ({input_folder}). Exit.\n")
+        return {}
+    mode, count, _ = next(iter(outputs))
+    indices = {key[2] for key in outputs}
+    missing = sorted(set(range(count)) - indices)
+    if missing:
+        click.echo(f"Missing shards: {missing}")
+
+    # Take the log written by the same run as each output, else its newest.
+    logs = latest_shards(logs, prefer=outputs)
+    for key in sorted(outputs.keys() - logs.keys()):
+        click.echo(f"No log found for shard {key[2]}/{key[1]}")
+    logs = [logs[key] for key in sorted(logs) if key in outputs]
+    outputs = [outputs[key] for key in sorted(outputs)]
+
+    dt = datetime.datetime.today()
+    timestamp = f"{dt.day}-{dt.month}-{dt.year}_{dt.hour}-{dt.minute}-{dt.second}"
+    output_folder = validate_path(output_folder or input_folder)
+    output_dir = output_folder + f"output_{mode}_{timestamp}{Path(outputs[0]).suffix}"
+    log_dir = output_folder + f"log_{mode}_{timestamp}.{log_format}"
+    report_dir = output_folder + f"report_{mode}_{timestamp}.html"
+
+    with progress_bar() as p:
+        task_progress = p.add_task("[purple]Merging...", total=len(outputs) + len(logs))
+        rows = merge_outputs(outputs, output_dir)
+        p.update(task_progress, advance=len(outputs))
+
+        log = LogWriter(log_dir, log_format)
+        processed = failed = 0
+        inputs = []
+        for path in logs:
+            metadata, entries = read_log(path)
+            log.write(entries)
+            processed += metadata.get("processed", 0)
+            failed += metadata.get("failed", 0)
+            if (folder := metadata.get("input directory")) and folder not in inputs:
+                inputs.append(folder)
+            p.update(task_progress, advance=1)
+        log.close(
+            {
+                "version": "BQAT v" + version,
+                "datetime": str(dt),
+                "input directory": inputs[0] if len(inputs) == 1 else inputs,
+                "shards": f"{len(indices)}/{count}",
+                "processed": processed,
+                "failed": failed,
+                "log": log.entries,
+            }
         )
-    file_total = 0
+
+    try:
+        if reporting and rows:
+            write_report(
+                report_dir,
+                output_dir,
+                f"EDA Report (BQAT v{version})",
+                report_options,
+            )
+        else:
+            report_dir = None
+    except Exception as e:
+        report_dir = None
+        click.echo(f"failed to generate report: {str(e)}")
+
+    job_timer = time.time() - job_timer
+    print("\n> Summary:")
+    summary = {
+        "Total process time": f"{job_timer:.2f}s",
+        "Merge Task": {
+            "Shards": f"{len(indices)}/{count}",
+            "Processed": processed,
+            "Rows": rows,
+            "Output": output_dir,
+            "Report": report_dir,
+            "Log": log_dir,
+        },
+    }
+    if missing:
+        summary["Merge Task"].update({"Missing": missing})
+    Console().print_json(json.dumps(summary))
+    print("\n>> Finished <<\n")
+    return {"output": output_dir, "log": log_dir, "report": report_dir}
+
+
+def preprocess(
+    input_dir: str,
+    output_dir: str,
+    debugging: bool,
+    config: dict,
+    shard: tuple = None,
+    backend: str = "auto",
+) -> str:
     file_count = 0
     tasks = []
-    file_globs = []
     task_timer = time.time()
     TYPE = config.get("source", ["wsq", "jpg", "jpeg", "png", "bmp", "jp2"])
 
@@ -721,18 +1064,15 @@ def preprocess(input_dir: str, output_dir: str, debugging: bool, config: dict) -
     if not output_dir:
         output_dir = Path(input_dir) / f"{str(uuid4())}"
 
-    for ext in extend(TYPE):
-        file_total += len(glob.glob(input_dir + "**/*." + ext, recursive=True))
-    for ext in extend(TYPE):
-        file_globs.append(glob.iglob(input_dir + "**/*." + ext, recursive=True))
+    discovery = FileDiscovery(
+        input_dir, TYPE, exclude=[output_dir], shard=shard
+    ).start()
 
     console = Console()
     metadata = Text(">> Preprocessing Task Started <<\n")
     metadata.append("\nInput: ")
     metadata.append(input_dir, style="bold yellow")
-    metadata.append(" (")
-    metadata.append(str(file_total), style="bold yellow")
-    metadata.append(" samples)\n")
+    metadata.append("\n")
 
     configs = 0
 
@@ -760,53 +1100,47 @@ def preprocess(input_dir: str, output_dir: str, debugging: bool, config: dict) -
     metadata.append("\n")
     console.print(metadata)
 
-    if file_total == 0:
+    if not discovery.wait():
         click.echo(">>> No valid input file. Exit.\n")
+        discovery.stop()
         return
 
     if configs == 0:
         click.echo(">>> No preprocessing task specified. Exit.\n")
+        discovery.stop()  # the walker would block on a full queue forever
         return
 
-    with Progress(
-        SpinnerColumn(), MofNCompleteColumn(), *Progress.get_default_columns()
-    ) as p:
-        task_progress = p.add_task("[cyan]Sending task...", total=file_total)
-        for files in file_globs:
-            for path in files:
-                file_count += 1
-                p.update(task_progress, advance=1)
-                try:
-                    tasks.append(
-                        preprocess_task.remote(
-                            path,
-                            output_dir,
-                            config,
-                        )
+    if backend == "auto":
+        discovery.wait(AUTO_PROCESS + 1)
+        backend = resolve_backend(backend, discovery.count)
+    click.echo(f"Backend: {backend}")
+    executor = get_executor(backend, debugging)
+
+    with progress_bar() as p:
+        task_progress = p.add_task("[cyan]Sending task...", total=None)
+        for path in discovery:
+            file_count += 1
+            p.update(task_progress, total=discovery.count, advance=1)
+            try:
+                tasks.append(
+                    executor.submit(
+                        preprocess_task,
+                        path,
+                        output_dir,
+                        config,
                     )
-                except Exception as e:
-                    click.echo(f"Preprocessing task failed: {e}")
-                if p.finished:
-                    break
-            if p.finished:
-                break
-
-    eta_step = 10  # ETA estimation interval
-    ready, not_ready = ray.wait(tasks)
-
-    with Progress(
-        SpinnerColumn(), MofNCompleteColumn(), *Progress.get_default_columns()
-    ) as p:
+                )
+            except Exception as e:
+                click.echo(f"Preprocessing task failed: {e}")
+
+    file_total = file_count
+
+    with progress_bar() as p:
         task_progress = p.add_task("[cyan]Processing...\n", total=file_total)
-        while not p.finished:
-            if len(not_ready) < eta_step:
-                p.update(task_progress, completed=file_total)
-                continue
-            tasks = not_ready
-            ready, not_ready = ray.wait(tasks, num_returns=eta_step)
+        while tasks:
+            ready, tasks = executor.completed(tasks)
             p.update(task_progress, advance=len(ready))
-
-    ray.get(tasks)
+    executor.shutdown()
     Console().log("[bold][red]Finished!")
 
     task_timer = time.time() - task_timer
@@ -829,7 +1163,6 @@ def preprocess(input_dir: str, output_dir: str, debugging: bool, config: dict) -
     print("\n>> Preprocessing Task Finished <<\n")
 
 
-@ray.remote
 def preprocess_task(file: str, output: dir, config: dict) -> None:
     try:
         file = Path(file)
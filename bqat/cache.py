@@ -0,0 +1,129 @@
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from bqat import __version__ as version
+
+from .core import bqat_core
+
+CORE_VERSION = getattr(bqat_core, "__version__", "unknown")
+
+
+def _scalar(value):
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class ResultCache:
+    """On-disk scan result cache.
+
+    Results are keyed by a hash of the file content plus the mode, engine,
+    conversion target and the BQAT/core versions, so re-submitted or copied
+    samples are served without decoding the image again. Entries live in a
+    SQLite database shared by all workers, and the least recently used
+    entries are evicted once the cache grows past `max_size` bytes.
+
+    A hit does not commit on its own. The last use of an entry is only
+    refreshed when it is older than `refresh` seconds, and refreshes are
+    kept in memory until the next `put`, `flush` or eviction, so a batch
+    of hits costs one commit at most.
+    """
+
+    def __init__(self, path, max_size=1 << 30, evict_every=1000, refresh=3600) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.evict_every = evict_every
+        self.refresh = refresh
+        self._used = {}
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._db = sqlite3.connect(self.path / "cache.db", timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(key TEXT PRIMARY KEY, value TEXT, size INTEGER, used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self._db.commit()
+
+    @staticmethod
+    def key(path, mode, engine, target="") -> str:
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        scope = f"{mode}|{engine}|{target}|{version}|{CORE_VERSION}"
+        return f"{digest.hexdigest()}:{hashlib.md5(scope.encode()).hexdigest()}"
+
+    def get(self, key, path) -> tuple:
+        """Look up a cached (result, logs) pair, rebound to `path`."""
+        row = self._db.execute(
+            "SELECT value, used FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        now = time.time()
+        if now - row[1] >= self.refresh:
+            self._used[key] = now
+            if len(self._used) >= self.evict_every:
+                self.flush()
+        value = json.loads(row[0])
+        result, logs = value["result"], value["logs"]
+        if result and "file" in result:
+            result["file"] = path
+        for log in logs:
+            if "file" in log:
+                log["file"] = path
+        return result, logs
+
+    def put(self, key, result, logs) -> None:
+        value = json.dumps({"result": result, "logs": logs}, default=_scalar)
+        self._db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+            (key, value, len(value), time.time()),
+        )
+        self._touch()
+        self._db.commit()
+        self._puts += 1
+        if self._puts % self.evict_every == 0:
+            self.evict()
+
+    def flush(self) -> None:
+        """Write the pending last-use refreshes."""
+        if self._used:
+            self._touch()
+            self._db.commit()
+
+    def _touch(self) -> None:
+        self._db.executemany(
+            "UPDATE results SET used = ? WHERE key = ?",
+            [(used, key) for key, used in self._used.items()],
+        )
+        self._used = {}
+
+    def evict(self) -> None:
+        self.flush()
+        total = self._db.execute("SELECT SUM(size) FROM results").fetchone()[0] or 0
+        if total <= self.max_size:
+            return
+        excess = total - self.max_size
+        freed = 0
+        stale = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM results ORDER BY used"
+        ):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM results WHERE key = ?", stale)
+        self._db.commit()
+
+    def close(self) -> None:
+        self.evict()
+        self._db.close()
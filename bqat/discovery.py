@@ -0,0 +1,202 @@
+import fnmatch
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+from pathlib import Path
+
+from .core.bqat_core.utils import extend
+
+
+class FileDiscovery:
+    """Single-pass input discovery.
+
+    Walks the input tree once with `os.scandir`, matching every requested
+    extension and the filename pattern in the same pass. Matches are fed to
+    a lazy iterator while the walk keeps counting in a background thread, so
+    the dispatcher can start as soon as the first file is found.
+
+    Files in `skip` are left out. Given the `manifest` of a previous run
+    (path to size and mtime), only new or modified files are yielded and
+    the state of every match is recorded in `seen`. With `shard` set to
+    (index, count), only files whose relative path hashes to that shard are
+    kept, so independent runs over all shards cover the input exactly once.
+    """
+
+    _END = object()
+
+    def __init__(
+        self,
+        root: str,
+        types: list,
+        pattern: str = "*",
+        limit: int = 0,
+        exclude: list = None,
+        skip: set = None,
+        manifest: dict = None,
+        shard: tuple = None,
+        buffer: int = 100000,
+    ) -> None:
+        self.root = str(root)
+        self.extensions = set(extend(list(types)))
+        self.pattern = re.compile(fnmatch.translate(pattern or "*"))
+        self.limit = limit
+        self.exclude = {os.path.abspath(p) for p in (exclude or [])}
+        self.skip = skip or set()
+        self.manifest = manifest
+        self.shard = shard
+        self.seen = {}
+        self.count = 0
+        self.skipped = 0
+        self.done = False
+        self.error = None
+        self._queue = queue.Queue(maxsize=buffer)
+        self._found = threading.Condition()
+        self._want = 1
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "FileDiscovery":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._walk, daemon=True)
+            self._thread.start()
+        return self
+
+    def match(self, name: str) -> bool:
+        if name.startswith("."):
+            return False
+        stem, dot, ext = name.rpartition(".")
+        if not dot or ext not in self.extensions:
+            return False
+        return self.pattern.match(stem) is not None
+
+    def in_shard(self, path: str) -> bool:
+        if not self.shard:
+            return True
+        index, count = self.shard
+        relative = os.path.relpath(path, self.root).replace(os.sep, "/")
+        digest = hashlib.blake2b(relative.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % count == index
+
+    def _walk(self) -> None:
+        try:
+            stack = [self.root]
+            while stack and not self._stop.is_set():
+                folder = stack.pop()
+                try:
+                    with os.scandir(folder) as it:
+                        entries = list(it)
+                except OSError:
+                    continue
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        continue
+                    if is_dir:
+                        if os.path.abspath(entry.path) not in self.exclude:
+                            stack.append(entry.path)
+                    elif self.match(entry.name):
+                        if not self.in_shard(entry.path):
+                            continue
+                        if entry.path in self.skip:
+                            self.skipped += 1
+                            continue
+                        if self.manifest is not None:
+                            try:
+                                stat = entry.stat()
+                            except OSError:
+                                continue
+                            state = (stat.st_size, stat.st_mtime_ns)
+                            self.seen[entry.path] = state
+                            if self.manifest.get(entry.path) == state:
+                                self.skipped += 1
+                                continue
+                        self.count += 1
+                        if self.count >= self._want:
+                            with self._found:
+                                self._found.notify_all()
+                        self._put(entry.path)
+                        if self.limit and self.count >= self.limit:
+                            return
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            with self._found:
+                self._found.notify_all()
+            self._put(self._END)
+
+    def _put(self, item) -> None:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def __iter__(self):
+        self.start()
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                break
+            yield item
+        if self.error:
+            raise self.error
+
+    def wait(self, count: int = 1) -> bool:
+        """Block until `count` matches are found or the walk is over."""
+        self._want = count
+        self.start()
+        with self._found:
+            self._found.wait_for(lambda: self.done or self.count >= count)
+        return self.count > 0
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def discover(root: str, types: list, pattern: str = "*", **kwargs) -> list:
+    """Collect all matching files under `root` in one walk."""
+    return [Path(p) for p in FileDiscovery(root, types, pattern, **kwargs)]
+
+
+def load_manifest(path, input_folder: str, mode: str) -> tuple:
+    """Load the manifest of a previous run, returns (metadata, entries)."""
+    if not os.path.exists(path):
+        return None, {}
+    with open(path) as f:
+        metadata = json.loads(f.readline() or "{}")
+        if metadata.get("input") != input_folder or metadata.get("mode") != mode:
+            return None, {}
+        entries = {}
+        for line in f:
+            file, size, mtime = json.loads(line)
+            entries[file] = (size, mtime)
+    return metadata, entries
+
+
+def write_manifest(path, metadata: dict, entries: dict) -> None:
+    """Persist input file states (path, size, mtime) for the next run."""
+    temp = f"{path}.temp"
+    with open(temp, "w") as f:
+        f.write(json.dumps(metadata) + "\n")
+        for file, (size, mtime) in entries.items():
+            f.write(json.dumps([file, size, mtime]) + "\n")
+    os.replace(temp, path)
+
+
+def parse_shard(value: str) -> tuple:
+    """Parse an `INDEX/COUNT` shard spec (zero-based index)."""
+    try:
+        index, count = (int(i) for i in value.split("/"))
+    except ValueError:
+        raise ValueError(f"invalid shard '{value}', expected INDEX/COUNT")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"invalid shard '{value}', index out of range")
+    return index, count
@@ -0,0 +1,558 @@
+import multiprocessing
+import os
+import time
+from concurrent import futures
+
+BACKENDS = ("auto", "ray", "process", "thread", "serial")
+
+AUTO_SERIAL = 8  # below this, starting any pool costs more than the work
+AUTO_PROCESS = 5000  # below this, a local process pool beats starting Ray
+START_POLL = 0.25  # seconds between checks for queued batches that started
+
+
+def cpu_count() -> int:
+    """Number of CPUs this process may use, honouring cgroup CPU limits."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    quota = period = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:  # cgroup v2
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:  # cgroup v1
+                quota = f.read().strip()
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = f.read().strip()
+        except OSError:
+            pass
+    if quota and quota not in ("max", "-1") and period:
+        count = min(count, max(1, int(quota) // int(period)))
+    return max(1, count)
+
+
+def mp_context():
+    """Start method for pool processes that is safe with threads running.
+
+    The driver runs discovery and writer threads, and a forked child can
+    inherit one of their locks held, so pool processes are started from a
+    clean fork server (or spawned where there is none).
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+def resolve_backend(backend: str, file_count: int) -> str:
+    """Pick a concrete backend, `auto` decides by the number of input files."""
+    if backend != "auto":
+        return backend
+    if file_count <= AUTO_SERIAL:
+        return "serial"
+    if file_count <= AUTO_PROCESS:
+        return "process"
+    return "ray"
+
+
+def get_executor(backend: str, debugging: bool = False, workers: int = 0) -> "Executor":
+    if backend == "ray":
+        return RayExecutor(debugging)
+    if backend == "process":
+        return ProcessExecutor(workers)
+    if backend == "thread":
+        return ThreadExecutor(workers)
+    if backend == "serial":
+        return SerialExecutor()
+    raise ValueError(f"backend '{backend}' not supported")
+
+
+class Executor:
+    """Common interface of the execution backends.
+
+    `submit` schedules `fn(*args)` and returns a handle, `wait` splits
+    handles into (ready, pending) lists the way `ray.wait` does, and
+    `result` fetches the return value of a ready handle. Worker processes
+    are reused across tasks in every backend, so engine state set up by
+    `scan()` on first use is paid once per worker.
+    """
+
+    name = ""
+    workers = 1
+
+    def submit(self, fn, *args):
+        raise NotImplementedError
+
+    def wait(self, handles: list, num_returns: int = 1, timeout=None) -> tuple:
+        raise NotImplementedError
+
+    def result(self, handle):
+        raise NotImplementedError
+
+    def started(self, handles: list) -> list:
+        """Handles among `handles` that a worker is running right now."""
+        return handles[: self.workers]
+
+    def completed(self, handles: list, timeout=None) -> tuple:
+        """Block until a handle is ready, returns every handle ready by then."""
+        ready, pending = self.wait(handles, 1, timeout)
+        if ready and pending:
+            more, pending = self.wait(pending, len(pending), 0)
+            ready += more
+        return ready, pending
+
+    def kill(self, handle) -> list:
+        """Stop a hung task, returns other in-flight handles lost with it."""
+        raise NotImplementedError(f"{self.name} backend cannot stop a running task")
+
+    def abandon(self, handle) -> None:
+        """Drop a task whose result is no longer needed."""
+
+    def ambiguous(self, error) -> bool:
+        """Whether a failure may have been caused by another task."""
+        return False
+
+    def shutdown(self) -> None:
+        pass
+
+
+class TaskActor:
+    """Long-lived Ray worker that runs the functions it is sent."""
+
+    def call(self, fn, *args):
+        return fn(*args)
+
+
+class RayExecutor(Executor):
+    """Warm pool of Ray actors, one per CPU, initialised once per process.
+
+    Every task goes to the actor with the fewest tasks in flight. The actors
+    live for the whole job, so engine state that `scan()` sets up on first
+    use stays loaded in them. Stopping a hung task kills its actor and
+    starts a fresh one in its place; the other tasks queued on it are lost.
+    """
+
+    name = "ray"
+
+    def __init__(self, debugging: bool = False) -> None:
+        import ray
+
+        self.ray = ray
+        if not ray.is_initialized():
+            if debugging:
+                ray.init()
+            else:
+                ray.init(
+                    configure_logging=True,
+                    logging_level="error",
+                    log_to_driver=False,
+                )
+        self.workers = max(1, int(ray.cluster_resources().get("CPU", 1)))
+        self._actor = ray.remote(num_cpus=1, max_restarts=0)(TaskActor)
+        self.actors = [self._actor.remote() for _ in range(self.workers)]
+        self.owner = {}  # handle -> (index, actor) until its result is fetched
+        self.abandoned = set()
+
+    def submit(self, fn, *args):
+        running = self._running()
+        load = [0] * self.workers
+        for handle in running:
+            load[self.owner[handle][0]] += 1
+        index = min(range(self.workers), key=load.__getitem__)
+        actor = self.actors[index]
+        handle = actor.call.remote(fn, *args)
+        self.owner[handle] = (index, actor)
+        return handle
+
+    def _running(self) -> list:
+        """Handles still in flight, forgetting finished abandoned ones."""
+        if not self.owner:
+            return []
+        handles = list(self.owner)
+        done, running = self.ray.wait(handles, num_returns=len(handles), timeout=0)
+        for handle in done:
+            if handle in self.abandoned:
+                self.abandoned.discard(handle)
+                del self.owner[handle]
+        return running
+
+    def started(self, handles: list) -> list:
+        # An actor runs its tasks one at a time in the order they were sent.
+        first = {}
+        running = set(self._running())
+        for handle, (index, _) in self.owner.items():
+            if handle in running:
+                first.setdefault(index, handle)
+        started = set(first.values())
+        return [handle for handle in handles if handle in started]
+
+    def wait(self, handles: list, num_returns: int = 1, timeout=None) -> tuple:
+        if not handles:
+            return [], []
+        return self.ray.wait(
+            handles, num_returns=min(num_returns, len(handles)), timeout=timeout
+        )
+
+    def result(self, handle):
+        index, actor = self.owner.pop(handle, (None, None))
+        try:
+            return self.ray.get(handle)
+        except self.ray.exceptions.RayActorError:
+            self._replace(index, actor)  # the actor died with the task
+            raise
+
+    def _replace(self, index, actor) -> None:
+        if index is not None and self.actors[index] is actor:
+            self.ray.kill(actor)
+            self.actors[index] = self._actor.remote()
+
+    def kill(self, handle) -> list:
+        index, actor = self.owner.pop(handle)
+        running = set(self._running())
+        lost = []
+        for other, (_, owner) in list(self.owner.items()):
+            if owner is actor:
+                del self.owner[other]
+                if other in running and other not in self.abandoned:
+                    lost.append(other)
+                self.abandoned.discard(other)
+        self._replace(index, actor)
+        return lost
+
+    def abandon(self, handle) -> None:
+        # Actor tasks cannot be force-cancelled, a running one finishes and is dropped.
+        self.ray.cancel(handle)
+        self.abandoned.add(handle)
+
+    def ambiguous(self, error) -> bool:
+        # A dead actor fails every task queued on it, not only the culprit.
+        return isinstance(error, self.ray.exceptions.RayActorError)
+
+    def shutdown(self) -> None:
+        for actor in self.actors:
+            self.ray.kill(actor)
+        self.actors = []
+        self.owner = {}
+
+
+class FutureExecutor(Executor):
+    """Backends built on `concurrent.futures`."""
+
+    def __init__(self, pool=None) -> None:
+        self.pool = pool
+        self.running = set()
+
+    def submit(self, fn, *args):
+        future = self.pool.submit(fn, *args)
+        self.running.add(future)
+        future.add_done_callback(self.running.discard)
+        return future
+
+    def wait(self, handles: list, num_returns: int = 1, timeout=None) -> tuple:
+        num_returns = min(num_returns, len(handles))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = [handle for handle in handles if handle.done()]
+        while len(done) < num_returns:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+            futures.wait(
+                [handle for handle in handles if not handle.done()],
+                timeout=remaining,
+                return_when=futures.FIRST_COMPLETED,
+            )
+            done = [handle for handle in handles if handle.done()]
+        ready = set(done[:num_returns])
+        return (
+            [handle for handle in handles if handle in ready],
+            [handle for handle in handles if handle not in ready],
+        )
+
+    def result(self, handle):
+        return handle.result()
+
+    def started(self, handles: list) -> list:
+        return [handle for handle in handles if handle.running()][: self.workers]
+
+    def abandon(self, handle) -> None:
+        handle.cancel()
+
+    def shutdown(self) -> None:
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
+
+
+class ProcessExecutor(FutureExecutor):
+    name = "process"
+
+    def __init__(self, workers: int = 0) -> None:
+        self.workers = workers or cpu_count()
+        super().__init__(
+            futures.ProcessPoolExecutor(self.workers, mp_context=mp_context())
+        )
+
+    def submit(self, fn, *args):
+        try:
+            return super().submit(fn, *args)
+        except futures.process.BrokenProcessPool:
+            # a crashed worker breaks the pool, start over with a fresh one
+            self.pool = futures.ProcessPoolExecutor(
+                self.workers, mp_context=mp_context()
+            )
+            return super().submit(fn, *args)
+
+    def ambiguous(self, error) -> bool:
+        return isinstance(error, futures.process.BrokenProcessPool)
+
+    def kill(self, handle) -> list:
+        """Replace the whole pool, a single pool process cannot be stopped."""
+        lost = [future for future in self.running if future is not handle]
+        self._terminate()
+        self.running = set()
+        self.pool = futures.ProcessPoolExecutor(self.workers, mp_context=mp_context())
+        return lost
+
+    def shutdown(self) -> None:
+        if self.running:
+            self._terminate()  # do not wait for abandoned stragglers
+        else:
+            self.pool.shutdown(cancel_futures=True)
+
+    def _terminate(self) -> None:
+        for process in list(getattr(self.pool, "_processes", {}).values()):
+            process.kill()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ThreadExecutor(FutureExecutor):
+    name = "thread"
+
+    def __init__(self, workers: int = 0) -> None:
+        self.workers = workers or cpu_count()
+        super().__init__(futures.ThreadPoolExecutor(self.workers))
+
+
+class SerialExecutor(FutureExecutor):
+    """Runs every task in the driver as soon as it is submitted."""
+
+    name = "serial"
+
+    def submit(self, fn, *args):
+        future = futures.Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class TaskSupervisor:
+    """Run batches on an executor with deadlines, retries and quarantine.
+
+    A batch gets a deadline of `timeout` seconds per file once it is among
+    the tasks the workers are running. A batch that misses it or crashes
+    its worker is stopped and its files are retried one by one in a fresh
+    worker; a file that fails more than `retries` times on its own is
+    quarantined. When the backend cannot tell which task crashed a worker
+    (a broken process pool takes every task with it), the affected batches
+    are re-run in groups with nothing else in flight: a group that crashes
+    is halved until a batch crashes on its own, which is then bisected
+    down to the file, while clean groups clear many batches at once.
+
+    With `speculative`, stragglers are duplicated on idle workers once
+    every batch has been submitted, and the first result wins.
+    """
+
+    def __init__(
+        self, executor, fn, args=(), timeout=0, retries=1, speculative=False
+    ) -> None:
+        self.executor = executor
+        self.fn = fn
+        self.args = args
+        self.timeout = timeout
+        self.retries = retries
+        self.speculative = speculative
+        self.draining = False
+        self.handles = []
+        self.jobs = {}
+        self.waiting = []
+        self.suspects = []
+        self.group = 0  # suspects run together in the current isolation round
+        self.crashed = False
+        self.durations = []
+
+    @property
+    def pending(self) -> int:
+        return len(self.handles) + len(self.waiting) + len(self.suspects)
+
+    def submit(self, batch: list, attempt: int = 0) -> None:
+        job = {"batch": batch, "attempt": attempt}
+        if self.suspects:
+            self.waiting.append(job)
+        else:
+            self._launch(job)
+
+    def _launch(self, job: dict) -> None:
+        if not job.get("handles"):
+            job.update({"handles": [], "deadline": None, "submitted": time.monotonic()})
+        handle = self.executor.submit(self.fn, job["batch"], *self.args)
+        job["handles"].append(handle)
+        self.handles.append(handle)
+        self.jobs[handle] = job
+
+    def _drop(self, handle) -> dict:
+        self.handles.remove(handle)
+        return self.jobs.pop(handle)
+
+    def _schedule(self) -> None:
+        if self.suspects:
+            if not self.handles:
+                # Group testing: run a share of the suspects with nothing else
+                # in flight, halved after a crash and doubled after a clean run.
+                if not self.group:
+                    self.group = max(1, len(self.suspects) // 2)
+                elif not self.crashed:
+                    self.group *= 2
+                self.crashed = False
+                group = self.suspects[: self.group]
+                del self.suspects[: self.group]
+                for job in group:
+                    job.update({"handles": [], "group": len(group)})
+                    self._launch(job)
+            return
+        self.group = 0
+        if self.waiting:
+            waiting, self.waiting = self.waiting, []
+            for job in waiting:
+                self._launch(job)
+
+    def collect(self, num_returns: int = 0) -> list:
+        """Wait for finished batches, returns (batch, value, error) tuples.
+
+        `error` is set, and `value` is None, for a quarantined file.
+        """
+        finished = []
+        while self.pending and len(finished) < max(1, num_returns):
+            self._schedule()
+            timeout = self._tick()
+            if num_returns:
+                ready, _ = self.executor.wait(
+                    self.handles, num_returns - len(finished), timeout
+                )
+            else:
+                ready, _ = self.executor.completed(self.handles, timeout)
+            for handle in ready:
+                finished.extend(self._finish(handle))
+            finished.extend(self._expire())
+            if self.speculative and self.draining:
+                self._speculate()
+        return finished
+
+    def _tick(self):
+        """Start the clock of running batches, returns seconds to the next deadline."""
+        if not self.timeout:
+            return 1.0 if self.speculative and self.draining else None
+        now = time.monotonic()
+        for handle in self.executor.started(self.handles):
+            job = self.jobs[handle]
+            if job["deadline"] is None:
+                job["deadline"] = now + self.timeout * len(job["batch"])
+        deadlines = [
+            job["deadline"] for job in self.jobs.values() if job["deadline"] is not None
+        ]
+        wait = max(0.0, min(deadlines) - now) if deadlines else None
+        if len(deadlines) < len(self.jobs):
+            # Look again soon for queued batches that have started meanwhile.
+            wait = min(wait, START_POLL) if wait is not None else START_POLL
+        return wait
+
+    def _finish(self, handle) -> list:
+        job = self._drop(handle)
+        try:
+            value = self.executor.result(handle)
+        except Exception as e:
+            if any(other in self.jobs for other in job["handles"]):
+                return []  # a speculative copy is still running
+            if not self.executor.ambiguous(e):
+                return self._fail(job, f"worker failed: {e}")
+            group = job.get("group", 0)
+            if group:
+                self.group = max(1, group // 2)
+                self.crashed = True
+            if group == 1:
+                return self._fail(job, f"worker failed: {e}", bisect=True)
+            # Any task in flight may have crashed the worker, test the batches
+            # again in smaller groups until the culprit runs on its own.
+            job["handles"] = []
+            self.suspects.insert(0, job)
+            return []
+        for other in job["handles"]:
+            if other is not handle and other in self.jobs:
+                self._drop(other)
+                self.executor.abandon(other)
+        self.durations.append(time.monotonic() - job["submitted"])
+        return [(job["batch"], value, None)]
+
+    def _expire(self) -> list:
+        if not self.timeout:
+            return []
+        now = time.monotonic()
+        failed = []
+        for handle in list(self.handles):
+            job = self.jobs.get(handle)
+            if job is None or job["deadline"] is None or job["deadline"] > now:
+                continue
+            self._drop(handle)
+            for lost in self.executor.kill(handle):
+                if lost in self.jobs:
+                    lost_job = self._drop(lost)
+                    lost_job["handles"] = []
+                    self._launch(lost_job)
+            seconds = self.timeout * len(job["batch"])
+            failed.extend(self._fail(job, f"timed out after {seconds:g}s"))
+        return failed
+
+    def _fail(self, job: dict, reason: str, bisect: bool = False) -> list:
+        for handle in job["handles"]:
+            if handle in self.jobs:
+                self._drop(handle)
+                self.executor.abandon(handle)
+        batch = job["batch"]
+        retry = self.suspects if job.get("group") == 1 else None
+        if len(batch) > 1 and bisect:
+            # It crashed its worker on its own, halve it to find the file.
+            half = len(batch) // 2
+            self.suspects[:0] = [
+                {"batch": part, "attempt": job["attempt"]}
+                for part in (batch[:half], batch[half:])
+            ]
+            return []
+        if len(batch) > 1:
+            for path in batch:  # isolate the file that caused it
+                self.submit([path], job["attempt"])
+            return []
+        if job["attempt"] < self.retries:
+            if retry is None:
+                self.submit(job["batch"], job["attempt"] + 1)
+            else:
+                retry.append({"batch": job["batch"], "attempt": job["attempt"] + 1})
+            return []
+        return [(job["batch"], None, reason)]
+
+    def _speculate(self) -> None:
+        idle = self.executor.workers - len(self.handles)
+        if idle <= 0 or self.suspects or len(self.durations) < 3:
+            return
+        durations = sorted(self.durations)
+        limit = max(2 * durations[len(durations) // 2], 1.0)
+        now = time.monotonic()
+        for job in {id(job): job for job in self.jobs.values()}.values():
+            if idle <= 0:
+                break
+            if len(job["handles"]) == 1 and now - job["submitted"] > limit:
+                self._launch(job)
+                idle -= 1
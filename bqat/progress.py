@@ -0,0 +1,75 @@
+import os
+from pathlib import Path
+
+from rich.progress import (
+    MofNCompleteColumn,
+    Progress,
+    ProgressColumn,
+    SpinnerColumn,
+)
+from rich.text import Text
+
+OFIQ_LOG_LINES = 34  # lines OFIQ writes to its log per sample
+
+
+class ThroughputColumn(ProgressColumn):
+    """Renders the processing rate of a task in items per second."""
+
+    def render(self, task) -> Text:
+        speed = task.finished_speed or task.speed
+        if speed is None:
+            return Text("- item/s", style="progress.data.speed")
+        return Text(f"{speed:.2f} item/s", style="progress.data.speed")
+
+
+def progress_bar() -> Progress:
+    """Progress bar with count, throughput and an ETA over a rolling window."""
+    return Progress(
+        SpinnerColumn(),
+        MofNCompleteColumn(),
+        *Progress.get_default_columns(),
+        ThroughputColumn(),
+        speed_estimate_period=60,
+    )
+
+
+class LogFollower:
+    """Follow a growing log file and count completed samples.
+
+    Only the bytes appended since the last `poll` are read, so following a
+    long run costs nothing per call beyond the new lines. Content present
+    before the follower was created is skipped, and the count starts over
+    if the file is replaced or truncated by a new run.
+    """
+
+    def __init__(self, path, lines_per_sample=OFIQ_LOG_LINES) -> None:
+        self.path = Path(path)
+        self.lines_per_sample = lines_per_sample
+        self.lines = 0
+        self.offset = 0
+        self.inode = None
+        try:
+            stat = os.stat(self.path)
+            self.inode, self.offset = stat.st_ino, stat.st_size
+        except OSError:
+            pass
+
+    @property
+    def samples(self) -> int:
+        return self.lines // self.lines_per_sample
+
+    def poll(self) -> int:
+        """Read what was appended since the last call, returns samples done."""
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return self.samples
+        with f:
+            stat = os.fstat(f.fileno())
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                self.inode, self.offset, self.lines = stat.st_ino, 0, 0
+            f.seek(self.offset)
+            while chunk := f.read(1 << 20):
+                self.offset += len(chunk)
+                self.lines += chunk.count(b"\n")
+        return self.samples
@@ -0,0 +1,525 @@
+import html
+import json
+import math
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bqat.executor import mp_context
+from bqat.schema import compact_dtypes, output_mode, read_dtypes
+from bqat.stats import OutputStats
+from bqat.utils import output_columns, read_output
+
+SAMPLING = ("reservoir", "stratified")
+REPORT_ENGINES = ("auto", "profile", "stream")
+STREAM_ROWS = 100000  # auto reports from running statistics above this
+LOGO = "https://www.biometix.com/wp-content/uploads/2020/10/logo.png"
+
+
+def iter_output(path, columns=None, chunksize=100000, compact=False):
+    """Stream a scan output (CSV or Parquet) as DataFrame chunks.
+
+    With `compact`, chunks are cast to the compact dtypes of the column
+    schema of the output's mode, see `bqat.schema`.
+    """
+    p = Path(path)
+    mode = output_mode(p)
+    if p.suffix.casefold() != ".parquet":
+        dtypes = None
+        if compact:
+            dtypes = read_dtypes(columns or output_columns(p), mode)
+        chunks = pd.read_csv(p, usecols=columns, chunksize=chunksize, dtype=dtypes)
+        for chunk in chunks:
+            yield compact_dtypes(chunk, mode) if compact else chunk
+        return
+
+    import pyarrow.parquet as pq
+
+    for part in sorted(p.glob("*.parquet")) if p.is_dir() else [p]:
+        f = pq.ParquetFile(part)
+        names = f.schema_arrow.names
+        if columns is not None:
+            names = [col for col in columns if col in names]
+        for batch in f.iter_batches(batch_size=chunksize, columns=names):
+            chunk = batch.to_pandas()
+            yield compact_dtypes(chunk, mode) if compact else chunk
+
+
+def strata(data: pd.DataFrame, column: str = None) -> pd.Series:
+    """Group labels for stratified sampling, the parent folder of each file by default."""
+    if column:
+        return data[column].astype(str)
+    return data["file"].astype(str).str.rpartition("/")[0]
+
+
+def allocate(counts: pd.Series, size: int) -> pd.Series:
+    """Split `size` rows across groups in proportion to their counts."""
+    total = counts.sum()
+    if total <= size:
+        return counts.astype(int)
+    share = counts * size / total
+    quota = np.floor(share).astype(int)
+    left = size - int(quota.sum())
+    quota.loc[(share - quota).nlargest(left).index] += 1
+    return quota
+
+
+class RowSampler:
+    """Uniform row sample of a stream of DataFrame chunks.
+
+    Every row gets a random key and only the `size` smallest keys are kept,
+    so the sample is drawn in one pass with memory bounded by the sample
+    plus one chunk. Given a `quota` per group of `stratify`, the smallest
+    keys are kept within each group instead.
+    """
+
+    def __init__(
+        self, size: int, quota: pd.Series = None, stratify: str = None, seed=0
+    ) -> None:
+        self.size = size
+        self.quota = quota
+        self.stratify = stratify
+        self.rng = np.random.default_rng(seed)
+        self.sample = None
+        self.rows = 0
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        self.rows += len(chunk)
+        chunk = chunk.assign(_key=self.rng.random(len(chunk)))
+        if self.quota is not None:
+            chunk["_stratum"] = strata(chunk, self.stratify)
+        if self.sample is not None:
+            chunk = pd.concat([self.sample, chunk], ignore_index=True)
+        if self.quota is None:
+            self.sample = chunk.nsmallest(self.size, "_key")
+        else:
+            chunk = chunk.sort_values("_key", kind="stable")
+            rank = chunk.groupby("_stratum", sort=False).cumcount().to_numpy()
+            keep = chunk["_stratum"].map(self.quota).fillna(0).to_numpy()
+            self.sample = chunk[rank < keep]
+
+    def result(self) -> pd.DataFrame:
+        if self.sample is None:
+            return pd.DataFrame()
+        sample = self.sample.sort_index()
+        return sample.drop(columns=["_key", "_stratum"], errors="ignore").reset_index(
+            drop=True
+        )
+
+
+def sample_output(
+    path, size: int, method: str = "reservoir", stratify: str = None, seed=0
+) -> tuple:
+    """Sample at most `size` rows of a scan output, returns (sample, total rows).
+
+    Rows are streamed, the full output is never loaded. Stratified sampling
+    counts the groups in a first pass over the `stratify` column only.
+    """
+    quota = None
+    if method == "stratified":
+        counts = pd.Series(dtype="int64")
+        for chunk in iter_output(path, [stratify or "file"]):
+            counts = counts.add(strata(chunk, stratify).value_counts(), fill_value=0)
+        quota = allocate(counts, size)
+    sampler = RowSampler(size, quota, stratify, seed)
+    for chunk in iter_output(path, compact=True):
+        sampler.add(chunk)
+    return sampler.result(), sampler.rows
+
+
+def describe_sampling(options: dict, rows: int, total: int) -> str:
+    """State how the profiled rows were drawn, for the report header."""
+    if rows >= total:
+        return f"All {total:,} rows"
+    method = options.get("sampling", "reservoir")
+    if method == "stratified":
+        by = options.get("stratify") or "parent folder"
+        method = f"stratified (by {by})"
+    return f"{method.capitalize()} sample of {rows:,} out of {total:,} rows"
+
+
+def report_data(path, options: dict = None) -> tuple:
+    """Load the rows to profile, returns (data, sampling note)."""
+    options = options or {}
+    size = options.get("sample", 0)
+    if not size:
+        data = read_output(path, compact=True)
+        return data, describe_sampling(options, len(data), len(data))
+    method = options.get("sampling", "reservoir")
+    stratify = options.get("stratify")
+    if method == "stratified":
+        column = stratify or "file"
+        if column not in output_columns(path):
+            raise ValueError(f"column '{column}' not found for stratified sampling")
+    data, total = sample_output(path, size, method, stratify)
+    return data, describe_sampling(options, len(data), total)
+
+
+def stream_stats(path) -> OutputStats:
+    """Accumulate the statistics of a scan output in one streamed pass."""
+    stats = OutputStats()
+    for chunk in iter_output(path):
+        stats.update_frame(chunk)
+    return stats
+
+
+def use_stats(options: dict, stats: OutputStats = None) -> bool:
+    """Whether to report from running statistics rather than profiling rows."""
+    engine = options.get("engine", "auto")
+    if engine == "auto":
+        return (
+            stats is not None and not options.get("sample") and stats.rows > STREAM_ROWS
+        )
+    return engine == "stream"
+
+
+def _profile(data, path, title, minimal, description, explorative) -> None:
+    from ydata_profiling import ProfileReport  # slow import, only load for reports
+
+    if minimal:
+        title = f"{title} [minimal]"
+        description = f"{description}, minimal profiling."
+    ProfileReport(
+        data,
+        title=title,
+        minimal=minimal,
+        explorative=explorative and not minimal,
+        samples=None,
+        correlations=None,
+        dataset={"description": description},
+        html={
+            "navbar_show": True,
+            "style": {
+                "full_width": True,
+                "theme": "simplex",
+                "logo": LOGO,
+            },
+        },
+    ).to_file(path)
+
+
+def profile(
+    data: pd.DataFrame,
+    path,
+    title: str,
+    sampling: str = "",
+    minimal: bool = False,
+    budget: float = 0,
+    explorative: bool = False,
+) -> str:
+    """Write the EDA report of `data`, returns the profiling mode used.
+
+    The sampling note goes in the report title and dataset description.
+    With a time `budget` (seconds), profiling runs in a child process that
+    is killed when it runs out of time. A full profile gets two thirds of
+    the budget, then falls back to a minimal profile for the rest.
+    """
+    if sampling:
+        title = f"{title} - {sampling}"
+    description = sampling or "All rows"
+    if not budget:
+        _profile(data, path, title, minimal, description, explorative)
+        return "minimal" if minimal else "full"
+
+    context = mp_context()  # the driver may hold Ray and writer threads
+    deadline = time.monotonic() + budget
+    attempts = [True] if minimal else [False, True]
+    for attempt in attempts:
+        remaining = deadline - time.monotonic()
+        if len(attempts) > 1 and not attempt:
+            remaining = budget * 2 / 3
+        if remaining <= 0:
+            break
+        worker = context.Process(
+            target=_profile,
+            args=(data, path, title, attempt, description, explorative),
+        )
+        worker.start()
+        worker.join(remaining)
+        if worker.is_alive():
+            worker.terminate()
+            worker.join()
+            Path(path).unlink(missing_ok=True)  # drop a half-written report
+            print(f"Profiling ran out of time ({'minimal' if attempt else 'full'}).")
+            continue
+        if worker.exitcode:
+            raise RuntimeError(f"profiling failed (exit code {worker.exitcode})")
+        return "minimal" if attempt else "full"
+    raise TimeoutError(f"report exceeded its time budget of {budget}s")
+
+
+def _histogram_svg(stats, width=240, height=60) -> str:
+    left, counts, bin_width = stats.edges()
+    if not len(counts):
+        return ""
+    peak = counts.max()
+    bar = width / len(counts)
+    bars = "".join(
+        f'<rect x="{i * bar:.1f}" y="{height - h:.1f}" width="{max(bar - 1, 1):.1f}" '
+        f'height="{h:.1f}"><title>[{lo:.4g}, {lo + bin_width:.4g}): {n}</title></rect>'
+        for i, (lo, n, h) in enumerate(zip(left, counts, counts / peak * height))
+    )
+    return f'<svg width="{width}" height="{height}" fill="#4a7ab5">{bars}</svg>'
+
+
+def _format(value) -> str:
+    if isinstance(value, float):
+        return "-" if math.isnan(value) or math.isinf(value) else f"{value:.6g}"
+    return f"{value:,}"
+
+
+def write_stats_report(stats, path, title: str) -> None:
+    """Write a report built from running statistics of the output.
+
+    Every figure comes from the accumulators, nothing is read back from the
+    output, so the cost does not depend on the number of rows. Quantiles
+    are estimated from the per-column reservoirs.
+    """
+    rows = []
+    for name, column in stats.columns.items():
+        cells = [
+            html.escape(name),
+            _format(column.count),
+            f"{column.missing / stats.rows:.1%}" if stats.rows else "-",
+        ]
+        if column.numeric:
+            cells += [
+                _format(float(column.mean)),
+                _format(column.std),
+                _format(float(column.min)),
+                *(_format(column.quantile(q)) for q in (0.05, 0.5, 0.95)),
+                _format(float(column.max)),
+                _format(column.zeros),
+                _histogram_svg(column),
+            ]
+        else:
+            cells += ["-"] * 9
+        if column.values:
+            top = sorted(column.values.items(), key=lambda item: -item[1])[:5]
+            distinct = f"{len(column.values):,}{'+' if column.other else ''}"
+            values = ", ".join(f"{html.escape(str(k))} ({v:,})" for k, v in top)
+            cells.append(f"{distinct} distinct: {values}")
+        else:
+            cells.append("")
+        rows.append("".join(f"<td>{cell}</td>" for cell in cells))
+
+    header = (
+        "Column",
+        "Count",
+        "Missing",
+        "Mean",
+        "Std",
+        "Min",
+        "P5",
+        "Median",
+        "P95",
+        "Max",
+        "Zeros",
+        "Histogram",
+        "Text values",
+    )
+    sampling = (
+        f"All {stats.rows:,} rows, statistics accumulated while results were "
+        "written (quantiles estimated from a sample of each column)."
+    )
+    with open(path, "w") as f:
+        f.write(f"""<!doctype html><html lang=en>
+<head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border-bottom: 1px solid #ddd; padding: 4px 8px; text-align: right; }}
+td:first-child, td:last-child {{ text-align: left; }}
+</style></head>
+<body>
+<img src="{LOGO}" height="40">
+<h1>{html.escape(title)}</h1>
+<p>{sampling}</p>
+<p>Rows: {stats.rows:,} &middot; Columns: {len(stats.columns):,}</p>
+<table>
+<tr>{"".join(f"<th>{name}</th>" for name in header)}</tr>
+{"".join(f"<tr>{row}</tr>" for row in rows)}
+</table>
+</body></html>
+""")
+
+
+TABLE_PAGE_ROWS = 1000
+
+TABLE_HTML = """<!doctype html><html lang=en>
+<head><meta charset="utf-8"><title>__TITLE__</title>
+<style>
+body { font-family: sans-serif; margin: 1em; }
+nav { margin: 0.5em 0; }
+nav input { width: 5em; }
+table { border-collapse: collapse; font-size: 0.9em; }
+th { cursor: pointer; position: sticky; top: 0; background: #eee; }
+th, td { border: 1px solid #ddd; padding: 2px 6px; white-space: nowrap; }
+</style></head>
+<body>
+<h2>__TITLE__</h2>
+<nav>
+<button onclick="load(0)">&laquo;</button>
+<button onclick="load(page - 1)">&lsaquo;</button>
+Page <input id="page" type="number" min="1" onchange="load(this.value - 1)">
+of <span id="pages"></span>
+<button onclick="load(page + 1)">&rsaquo;</button>
+<button onclick="load(meta.pages - 1)">&raquo;</button>
+<span id="status"></span>
+</nav>
+<table><thead><tr id="head"></tr></thead><tbody id="body"></tbody></table>
+<script>
+const meta = __META__;
+// PuBu colour map, as used by pandas background_gradient.
+const stops = [[255,247,251],[236,231,242],[208,209,230],[166,189,219],
+  [116,169,207],[54,144,192],[5,112,176],[4,90,141],[2,56,88]];
+let page = 0, rows = [], sorted = -1, ascending = true;
+
+function colour(t) {
+  const x = Math.min(Math.max(t, 0), 1) * (stops.length - 1);
+  const i = Math.min(Math.floor(x), stops.length - 2), f = x - i;
+  const c = stops[i].map((v, k) => Math.round(v + (stops[i + 1][k] - v) * f));
+  const dark = 0.299 * c[0] + 0.587 * c[1] + 0.114 * c[2] < 128;
+  return ["rgb(" + c.join(",") + ")", dark ? "#f1f1f1" : "#000"];
+}
+
+function render() {
+  const body = document.getElementById("body");
+  body.replaceChildren();
+  for (const row of rows) {
+    const tr = document.createElement("tr");
+    meta.columns.forEach((name, i) => {
+      const value = i < row.length ? row[i] : null;
+      const td = document.createElement("td");
+      const range = meta.ranges[i];
+      if (name === "file" && value !== null) {
+        const a = document.createElement("a");
+        a.href = "file://" + meta.cwd + "/" + value;
+        a.target = "_blank";
+        a.textContent = value;
+        td.appendChild(a);
+      } else {
+        td.textContent = value === null ? "" : value;
+      }
+      if (range && typeof value === "number") {
+        const span = range[1] - range[0];
+        [td.style.background, td.style.color] = colour(span ? (value - range[0]) / span : 0);
+      }
+      tr.appendChild(td);
+    });
+    body.appendChild(tr);
+  }
+}
+
+function sort(i) {
+  ascending = sorted === i ? !ascending : true;
+  sorted = i;
+  rows.sort((a, b) => {
+    if (a[i] === b[i]) return 0;
+    if (a[i] === null) return 1;
+    if (b[i] === null) return -1;
+    return (a[i] < b[i] ? -1 : 1) * (ascending ? 1 : -1);
+  });
+  render();
+}
+
+function bqatPage(n, data) {
+  if (n !== page) return;
+  rows = data;
+  sorted = -1;
+  document.getElementById("status").textContent =
+    "rows " + (n * meta.size + 1) + "-" + (n * meta.size + data.length) + " of " + meta.rows;
+  render();
+}
+
+function load(n) {
+  n = Math.min(Math.max(Number(n) || 0, 0), meta.pages - 1);
+  page = n;
+  document.getElementById("page").value = n + 1;
+  document.getElementById("status").textContent = "loading...";
+  // Script tags load from file:// where fetch is blocked, so pages are JSONP.
+  const script = document.createElement("script");
+  script.src = meta.folder + "/page_" + n + ".js";
+  script.onload = script.onerror = () => script.remove();
+  document.body.appendChild(script);
+}
+
+meta.columns.forEach((name, i) => {
+  const th = document.createElement("th");
+  th.textContent = name;
+  th.onclick = () => sort(i);
+  document.getElementById("head").appendChild(th);
+});
+document.getElementById("pages").textContent = meta.pages;
+load(0);
+</script>
+</body></html>
+"""
+
+
+def write_table(data, path, cwd="", page_rows=TABLE_PAGE_ROWS) -> str:
+    """Write the results table as an HTML viewer with paged data files.
+
+    Rows are split into pages of `page_rows`, each a small script in a
+    folder next to the viewer that is only loaded when the page is opened,
+    so the viewer stays light for any number of rows and needs no network.
+    `data` is a DataFrame or an iterable of DataFrame chunks, which are
+    paged as they come. The colour range of each numeric column is kept
+    with a vectorised min/max per chunk and written to the viewer last.
+    """
+    path = Path(path)
+    folder = path.with_name(f"{path.stem}_pages")
+    folder.mkdir(parents=True, exist_ok=True)
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    columns, low, high = {}, {}, {}
+    rows = pages = 0
+    buffer = []
+
+    def write_page(page: pd.DataFrame) -> None:
+        nonlocal pages
+        page = page.reindex(columns=list(columns))
+        with open(folder / f"page_{pages}.js", "w") as f:
+            f.write(f"bqatPage({pages}, {page.to_json(orient='values')});\n")
+        pages += 1
+
+    for chunk in chunks:
+        columns.update(dict.fromkeys(chunk.columns))
+        numeric = chunk.apply(pd.to_numeric, errors="coerce")
+        for col, value in numeric.min().dropna().items():
+            low[col] = min(low.get(col, value), value)
+        for col, value in numeric.max().dropna().items():
+            high[col] = max(high.get(col, value), value)
+        rows += len(chunk)
+        buffer.append(chunk)
+        buffered = sum(len(part) for part in buffer)
+        if buffered >= page_rows:
+            chunk = pd.concat(buffer, ignore_index=True)
+            full = buffered - buffered % page_rows
+            for start in range(0, full, page_rows):
+                write_page(chunk.iloc[start : start + page_rows])
+            buffer = [chunk.iloc[full:]]
+    if sum(len(part) for part in buffer) or not pages:
+        write_page(pd.concat(buffer) if buffer else pd.DataFrame())
+
+    meta = {
+        "columns": [str(col) for col in columns],
+        "ranges": [
+            [float(low[col]), float(high[col])] if col in low else None
+            for col in columns
+        ],
+        "rows": rows,
+        "size": page_rows,
+        "pages": pages,
+        "folder": folder.name,
+        "cwd": cwd,
+    }
+    title = html.escape(path.stem)
+    with open(path, "w") as f:
+        f.write(
+            TABLE_HTML.replace("__TITLE__", title).replace(
+                "__META__", json.dumps(meta).replace("</", "<\\/")
+            )
+        )
+    return str(path)
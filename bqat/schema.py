@@ -0,0 +1,155 @@
+import fnmatch
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Column kinds: "float" loads as float32, "int" as the smallest integer type
+# that holds the values, "label" as categorical and "path" as Arrow strings.
+# Unlisted columns are sized from their values (see `compact_dtypes`).
+COMMON = {
+    "file": "path",
+    "*gender*": "label",
+    "*ethnicity*": "label",
+    "*emotion*": "label",
+    "*race*": "label",
+    "*_label": "label",
+    "*_type": "label",
+}
+
+SCHEMAS = {
+    "finger": {
+        "NFIQ2": "int",
+        "Quality": "int",
+        "Width": "int",
+        "Height": "int",
+        "*": "float",
+    },
+    "face": {
+        "*.scalar": "int",
+        "*.native": "float",
+    },
+    "iris": {},
+    "speech": {
+        "*": "float",
+    },
+}
+
+LABEL_RATIO = 0.5  # text columns with fewer distinct values per row are labels
+
+
+def output_mode(path) -> str:
+    """Mode of a scan output from its name (output_{mode}_...), if any."""
+    name = Path(path).stem.split("_")
+    if len(name) > 1 and name[0] == "output" and name[1] in SCHEMAS:
+        return name[1]
+    return ""
+
+
+def column_kind(column: str, mode: str = "") -> str:
+    """Kind of a column from the schema of `mode`, exact names first."""
+    schema = {**SCHEMAS.get(mode, {}), **COMMON}
+    if column in schema:
+        return schema[column]
+    for pattern, kind in schema.items():
+        if fnmatch.fnmatchcase(column, pattern):
+            return kind
+    return ""
+
+
+def read_dtypes(columns: list, mode: str = "") -> dict:
+    """Dtypes that are safe to request from the CSV reader up front."""
+    dtypes = {}
+    for column in columns:
+        kind = column_kind(column, mode)
+        if kind == "path":
+            dtypes[column] = "string[pyarrow]"
+        elif kind == "label":
+            dtypes[column] = "category"
+    return dtypes
+
+
+def _whole(values: pd.Series) -> bool:
+    if values.dtype.kind in "iu":
+        return bool(len(values))
+    finite = values.dropna().to_numpy()
+    return bool(len(finite)) and bool(
+        np.isfinite(finite).all() and (finite % 1 == 0).all()
+    )
+
+
+def _integer(values: pd.Series) -> pd.Series:
+    if values.isna().any():
+        present = values.dropna()
+        if not len(present):
+            return values.astype("float32")
+        small = pd.to_numeric(present, downcast="integer")
+        if present.min() >= 0:
+            small = pd.to_numeric(present, downcast="unsigned")
+        nullable = str(small.dtype).replace("uint", "UInt").replace("int", "Int")
+        return values.astype(nullable)
+    if values.min() >= 0:
+        return pd.to_numeric(values, downcast="unsigned")
+    return pd.to_numeric(values, downcast="integer")
+
+
+def compact_dtypes(data: pd.DataFrame, mode: str = "") -> pd.DataFrame:
+    """Cast the columns of a loaded output to compact dtypes.
+
+    Metric columns become float32 or the smallest integer type that holds
+    their values, path columns Arrow strings and label columns categorical.
+    A column whose values do not fit its kind keeps the type it was loaded
+    with, so an unexpected value never fails the load.
+    """
+    for column in data.columns:
+        values = data[column]
+        kind = column_kind(column, mode)
+        try:
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                continue
+            if pd.api.types.is_bool_dtype(values):
+                continue
+            if kind == "label":
+                data[column] = values.astype("category")
+            elif pd.api.types.is_numeric_dtype(values):
+                if kind != "float" and _whole(values):
+                    data[column] = _integer(values)
+                elif kind or values.dtype.kind == "f":
+                    data[column] = values.astype("float32")
+            elif kind == "path":
+                data[column] = values.astype("string[pyarrow]")
+            elif (
+                values.dtype == object and values.nunique() < len(values) * LABEL_RATIO
+            ):
+                data[column] = values.astype("category")
+        except (TypeError, ValueError, OverflowError):
+            continue
+    return data
+
+
+def concat_chunks(chunks) -> pd.DataFrame:
+    """Concatenate compacted chunks, keeping categorical columns categorical."""
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = {
+        column
+        for chunk in chunks
+        for column in chunk.columns
+        if isinstance(chunk[column].dtype, pd.CategoricalDtype)
+    }
+    for column in columns:
+        categories = set()
+        for chunk in chunks:
+            if column in chunk:
+                categories.update(chunk[column].dropna().unique())
+        try:
+            categories = sorted(categories)
+        except TypeError:
+            categories = sorted(categories, key=str)
+        for chunk in chunks:
+            if column in chunk:
+                chunk[column] = chunk[column].astype(pd.CategoricalDtype(categories))
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,507 @@
+import csv
+import json
+import os
+import queue
+import shutil
+import threading
+from pathlib import Path
+
+
+def flatten(row: dict, parent: str = "", sep: str = ".") -> dict:
+    """Flatten nested result dicts into dotted column names."""
+    out = {}
+    for key, value in row.items():
+        key = f"{parent}{sep}{key}" if parent else str(key)
+        if isinstance(value, dict) and value:
+            out.update(flatten(value, key, sep))
+        else:
+            out[key] = value
+    return out
+
+
+class CsvWriter:
+    """Streaming CSV writer for result rows.
+
+    The file handle stays open for the whole run and the column set is
+    tracked in memory. The header is written up front from the first batch
+    of rows, so in the usual case closing the writer costs nothing. Columns
+    that first appear later are appended to the end (earlier rows simply
+    have fewer fields) and the header is seamed on at close by streaming
+    the rows under the new header line, never holding them in memory.
+    Appending to an existing output picks up its header and carries on.
+    """
+
+    def __init__(self, path, buffer=1 << 16) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.buffer = buffer
+        self.columns = {}
+        self.header = []
+        self._file = None
+        self._writer = None
+
+    def write(self, rows: list) -> None:
+        rows = [flatten(row) for row in rows]
+        if self._file is None:
+            self._open()  # picks up the header of an existing output
+        columns = self.columns
+        for row in rows:
+            for key in row:
+                if key not in columns:
+                    columns[key] = None
+        if not self.header:
+            self.header = list(columns)
+            self._writer.writerow(self.header)
+        for row in rows:
+            self._writer.writerow([row.get(key) for key in columns])
+
+    def _open(self) -> None:
+        if self.path.exists() and self.path.stat().st_size:
+            truncate_partial_line(self.path)
+            with open(self.path, newline="") as f:
+                self.header = next(csv.reader(f), [])
+            self.columns = dict.fromkeys(self.header)
+        self._file = open(self.path, "a", newline="", buffering=self.buffer)
+        self._writer = csv.writer(self._file)
+
+    def flush(self) -> None:
+        if self._file:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if len(self.columns) == len(self.header):
+            return
+        seam = self.path.with_name(self.path.name + ".seam")
+        with open(self.path, newline="") as src, open(seam, "w", newline="") as dst:
+            csv.writer(dst).writerow(self.columns)
+            src.readline()
+            shutil.copyfileobj(src, dst, 1 << 20)
+        os.replace(seam, self.path)
+        self.header = list(self.columns)
+
+
+class ParquetWriter:
+    """Columnar result writer.
+
+    Rows are buffered and written as row groups of `row_group_size` into
+    part files under the output directory. When a row group brings a new
+    column or a value that does not fit the current schema, the current
+    part is closed and a new one is started, so the schema can grow during
+    the run. `read_output` unifies the parts when loading. A column whose
+    values in a row group mix types is stored as strings.
+
+    Writing into an existing output adds new parts after the ones already
+    there; unfinished parts left behind by an interrupted run are dropped.
+    """
+
+    def __init__(self, path, row_group_size=10000) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.row_group_size = row_group_size
+        self.columns = {}
+        self.parts = 0
+        self._rows = []
+        self._schema = None
+        self._writer = None
+
+        for part in sorted(self.path.glob("part-*.parquet")):
+            try:
+                pq.read_schema(part)
+            except (pa.ArrowInvalid, OSError):
+                part.unlink()
+                continue
+            self.parts = max(self.parts, int(part.stem.split("-")[1]) + 1)
+
+    def write(self, rows: list) -> None:
+        columns = self.columns
+        for row in rows:
+            row = flatten(row)
+            for key in row:
+                if key not in columns:
+                    columns[key] = None
+            self._rows.append(row)
+        if len(self._rows) >= self.row_group_size:
+            self._write_group()
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        if self._rows:
+            self._write_group()
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    def _write_group(self) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        rows, self._rows = self._rows, []
+        table = None
+        if self._schema is not None and len(self.columns) == len(self._schema):
+            data = {key: [row.get(key) for row in rows] for key in self._schema.names}
+            try:
+                table = pa.Table.from_pydict(data, schema=self._schema)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                table = None
+        if table is None:
+            table = pa.table(
+                {
+                    key: arrow_column([row.get(key) for row in rows])
+                    for key in self.columns
+                }
+            )
+            if self._writer:
+                self._writer.close()
+            self._schema = table.schema
+            self._writer = pq.ParquetWriter(
+                self.path / f"part-{self.parts:05d}.parquet", self._schema
+            )
+            self.parts += 1
+        self._writer.write_table(table)
+
+
+def arrow_column(values: list):
+    """Arrow array of `values`, as strings when they mix types Arrow can't unify."""
+    import pyarrow as pa
+
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(
+            [None if value is None else str(value) for value in values], pa.string()
+        )
+
+
+class LogWriter:
+    """Streaming log writer.
+
+    Entries are appended one JSON object per line as they arrive, and the
+    entry and failure counts are kept incrementally. With `format="jsonl"`
+    the log stays in JSON Lines and the metadata goes to a small separate
+    `.meta.json` file. With `format="json"` the usual `{"metadata", "log"}`
+    document is assembled at the end by streaming the lines back, so
+    finalisation never loads the whole log into memory.
+    """
+
+    def __init__(self, path, format="json") -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.format = format
+        self.entries = 0
+        self.failed = 0
+        if format == "jsonl":
+            self.lines = self.path
+            self.meta_path = self.path.with_suffix(".meta.json")
+        else:
+            self.lines = self.path.with_name(self.path.name + ".part")
+            self.meta_path = None
+        self._file = open(self.lines, "w")
+
+    def write(self, entries: list) -> None:
+        for entry in entries:
+            self._file.write(json.dumps(entry) + "\n")
+            self.entries += 1
+            if entry.get("load image"):
+                self.failed += 1
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self, metadata: dict) -> None:
+        self._file.close()
+        if self.format == "jsonl":
+            with open(self.meta_path, "w") as f:
+                json.dump({"metadata": metadata, "log": self.path.name}, f)
+            return
+        with open(self.path, "w") as out, open(self.lines) as f:
+            out.write('{"metadata": ' + json.dumps(metadata) + ', "log": [')
+            for index, line in enumerate(f):
+                if index:
+                    out.write(", ")
+                out.write(line.rstrip("\n"))
+            out.write("]}")
+        self.lines.unlink()
+
+
+def truncate_partial_line(path) -> None:
+    """Drop a trailing partial row left behind by an interrupted write."""
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if not size:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        offset = max(0, size - (1 << 20))
+        f.seek(offset)
+        end = f.read().rfind(b"\n")
+        f.truncate(offset + end + 1 if end >= 0 else 0)
+
+
+def completed_files(path) -> set:
+    """Collect the `file` entries already written to a scan output.
+
+    Reads only the `file` column (streamed for CSV, projected for Parquet)
+    rather than loading the whole output. A partial CSV row left behind by
+    an interrupted run is dropped first, so it never counts as completed.
+    """
+    p = Path(path)
+
+    if p.suffix.casefold() == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        files = set()
+        for part in sorted(p.glob("part-*.parquet")):
+            try:
+                if "file" in pq.read_schema(part).names:
+                    column = pq.read_table(part, columns=["file"]).column("file")
+                    files.update(column.to_pylist())
+            except (pa.ArrowInvalid, OSError):
+                continue
+        return files
+
+    truncate_partial_line(p)
+    with open(p, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if "file" not in header:
+            return set()
+        column = header.index("file")
+        return {row[column] for row in reader if len(row) > column}
+
+
+def drop_files(path, files: set) -> int:
+    """Remove the rows of `files` from a scan output, returns rows dropped.
+
+    CSV outputs are streamed into a sibling file and renamed over the
+    original; only the Parquet parts that hold such rows are rewritten.
+    """
+    p = Path(path)
+    dropped = 0
+    if p.suffix.casefold() == ".parquet":
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        values = pa.array(list(files), type=pa.string())
+        for part in sorted(p.glob("part-*.parquet")):
+            if "file" not in pq.read_schema(part).names:
+                continue
+            column = pq.read_table(part, columns=["file"]).column("file")
+            if not pc.any(pc.is_in(column, value_set=values)).as_py():
+                continue
+            table = pq.read_table(part)
+            kept = table.filter(
+                pc.invert(pc.is_in(table.column("file"), value_set=values))
+            )
+            dropped += table.num_rows - kept.num_rows
+            # A part cut short by a crash would be deleted with all its rows.
+            temp = part.with_name(part.name + ".temp")
+            pq.write_table(kept, temp)
+            os.replace(temp, part)
+        return dropped
+
+    seam = p.with_name(p.name + ".seam")
+    with open(p, newline="") as src, open(seam, "w", newline="") as dst:
+        reader = csv.reader(src)
+        writer = csv.writer(dst)
+        header = next(reader, [])
+        writer.writerow(header)
+        column = header.index("file") if "file" in header else None
+        for row in reader:
+            if column is not None and len(row) > column and row[column] in files:
+                dropped += 1
+                continue
+            writer.writerow(row)
+    os.replace(seam, p)
+    return dropped
+
+
+def output_size(path) -> int:
+    """Bytes on disk of a scan output (all parts of a Parquet output)."""
+    p = Path(path)
+    if p.is_dir():
+        return sum(part.stat().st_size for part in p.glob("part-*.parquet"))
+    return p.stat().st_size if p.exists() else 0
+
+
+def merge_outputs(paths: list, path) -> int:
+    """Stream several scan outputs into one, returns the rows written.
+
+    CSV rows are copied through under the union of all headers, and
+    Parquet parts are copied over as they are, so no output is ever loaded
+    as a whole.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    if path.suffix.casefold() == ".parquet":
+        import pyarrow.parquet as pq
+
+        path.mkdir(parents=True, exist_ok=True)
+        parts = 0
+        for source in paths:
+            for part in sorted(Path(source).glob("part-*.parquet")):
+                rows += pq.read_metadata(part).num_rows
+                shutil.copyfile(part, path / f"part-{parts:05d}.parquet")
+                parts += 1
+        return rows
+
+    columns = {}
+    for source in paths:
+        with open(source, newline="") as f:
+            columns.update(dict.fromkeys(next(csv.reader(f), [])))
+    columns = list(columns)
+    with open(path, "w", newline="") as dst:
+        writer = csv.writer(dst)
+        writer.writerow(columns)
+        for source in paths:
+            with open(source, newline="") as src:
+                reader = csv.reader(src)
+                header = next(reader, [])
+                if header == columns[: len(header)]:
+                    for row in reader:
+                        writer.writerow(row)
+                        rows += 1
+                    continue
+                order = [header.index(key) if key in header else -1 for key in columns]
+                for row in reader:
+                    writer.writerow(
+                        [row[i] if 0 <= i < len(row) else "" for i in order]
+                    )
+                    rows += 1
+    return rows
+
+
+def read_log(path) -> tuple:
+    """Read a scan log, returns (metadata, entries).
+
+    JSON Lines logs are streamed; a JSON log document has to be parsed
+    whole, so only one of them is held in memory at a time.
+    """
+    p = Path(path)
+    if p.suffix.casefold() == ".jsonl":
+        meta = p.with_suffix(".meta.json")
+        metadata = {}
+        if meta.exists():
+            with open(meta) as f:
+                metadata = json.load(f).get("metadata", {})
+
+        def entries():
+            with open(p) as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+        return metadata, entries()
+    with open(p) as f:
+        log = json.load(f)
+    return log.get("metadata", {}), iter(log.get("log", []))
+
+
+class ResultSink:
+    """Single writer for scan results and logs.
+
+    Workers return their result dicts and log entries instead of appending
+    to the output files themselves. The sink queues them and a dedicated
+    driver thread writes them out in batches, so the output CSV and the log
+    only ever have one writer. Given `stats`, every batch of results also
+    updates the running statistics of the output on the way out.
+
+    A batch that fails to write is counted in `lost` and the first error is
+    raised on `close`, but later batches and the log keep being written.
+    """
+
+    _END = object()
+
+    def __init__(
+        self,
+        output_dir,
+        log_dir,
+        log_format="json",
+        output_format="csv",
+        buffer=500,
+        interval=1.0,
+        stats=None,
+    ) -> None:
+        self.output_dir = output_dir
+        self.log_dir = log_dir
+        self.buffer = buffer
+        self.interval = interval
+        self.rows = 0
+        self.lost = 0
+        self.error = None
+        self.stats = stats
+        if output_format == "parquet":
+            self.output = ParquetWriter(output_dir)
+        else:
+            self.output = CsvWriter(output_dir)
+        self.log = LogWriter(log_dir, log_format)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, results=(), logs=()) -> None:
+        self._queue.put((list(results), list(logs)))
+
+    def close(self) -> None:
+        self._queue.put(self._END)
+        self._thread.join()
+        self.output.close()
+        if self.lost:
+            raise RuntimeError(f"{self.lost} results not written ({self.error})")
+        if self.error:
+            raise self.error
+
+    def _run(self) -> None:
+        results, logs = [], []
+        while True:
+            try:
+                item = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                item = None
+            if item is self._END:
+                self._flush(results, logs)
+                return
+            if item:
+                results.extend(item[0])
+                logs.extend(item[1])
+            if item is None or len(results) + len(logs) >= self.buffer:
+                self._flush(results, logs)
+                results, logs = [], []
+
+    def _flush(self, results, logs) -> None:
+        if results:
+            try:
+                self.output.write(results)
+                self.output.flush()
+                self.rows += len(results)
+                self._update_stats(results)
+            except Exception as e:
+                self.lost += len(results)
+                self.error = self.error or e
+        if logs:
+            try:
+                self.log.write(logs)
+                self.log.flush()
+            except Exception as e:
+                self.error = self.error or e
+
+    def _update_stats(self, results) -> None:
+        if self.stats is None:
+            return
+        try:
+            self.stats.update([flatten(row) for row in results])
+        except Exception:
+            # Statistics are best effort, the output must still be written.
+            self.stats = None
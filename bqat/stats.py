@@ -0,0 +1,167 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+
+class ColumnStats:
+    """Running statistics of one output column.
+
+    Numeric values update the count, min/max and mean/variance (merged per
+    batch with Chan's parallel form of Welford's algorithm) and a histogram
+    of `bins` fixed-width bins. The histogram range starts at the first
+    batch and doubles its bin width whenever a value falls outside of it,
+    merging neighbouring bins, so it never needs a second pass. Quantiles
+    are estimated from a uniform reservoir of `reservoir` values, which
+    stays accurate when outliers stretch the histogram. Values that are not
+    numbers are counted by value, up to `top` distinct values.
+    """
+
+    def __init__(
+        self, bins: int = 64, top: int = 1000, reservoir: int = 10000, seed=0
+    ) -> None:
+        self.bins = bins
+        self.top = top
+        self.reservoir = reservoir
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.empty(0)
+        self.sample = np.empty(0)
+        self.count = 0
+        self.missing = 0
+        self.numeric = 0
+        self.zeros = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.origin = 0.0
+        self.width = 0.0
+        self.hist = np.zeros(bins, dtype=np.int64)
+        self.values = {}
+        self.other = 0
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.numeric - 1) if self.numeric > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def update(self, values: pd.Series) -> None:
+        missing = values.isna()
+        self.missing += int(missing.sum())
+        values = values[~missing]
+        self.count += len(values)
+        if values.dtype == bool:
+            values = values.astype(int)
+        numbers = pd.to_numeric(values, errors="coerce")
+        text = values[numbers.isna()]
+        if len(text):
+            self._count(text.astype(str))
+        x = numbers.dropna().to_numpy(dtype=float)
+        x = x[np.isfinite(x)]
+        if len(x):
+            self._add(x)
+
+    def _count(self, text: pd.Series) -> None:
+        for value, count in text.value_counts().items():
+            if value in self.values or len(self.values) < self.top:
+                self.values[value] = self.values.get(value, 0) + count
+            else:
+                self.other += count
+
+    def _add(self, x: np.ndarray) -> None:
+        n, mean = len(x), x.mean()
+        m2 = float(((x - mean) ** 2).sum())
+        total = self.numeric + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta**2 * self.numeric * n / total
+        self.numeric = total
+        self.zeros += int((x == 0).sum())
+        lo, hi = float(x.min()), float(x.max())
+        self.min, self.max = min(self.min, lo), max(self.max, hi)
+        self._fit(lo, hi)
+        index = ((x - self.origin) / self.width).astype(np.int64)
+        np.clip(index, 0, self.bins - 1, out=index)
+        self.hist += np.bincount(index, minlength=self.bins)
+        self._keep(x)
+
+    def _keep(self, x: np.ndarray) -> None:
+        # Reservoir by random keys: keep the values with the smallest keys.
+        keys = self.rng.random(len(x))
+        if len(self.keys) >= self.reservoir:
+            inside = keys < self.keys.max()
+            keys, x = keys[inside], x[inside]
+        keys = np.concatenate([self.keys, keys])
+        values = np.concatenate([self.sample, x])
+        if len(keys) > self.reservoir:
+            keep = np.argpartition(keys, self.reservoir)[: self.reservoir]
+            keys, values = keys[keep], values[keep]
+        self.keys, self.sample = keys, values
+
+    def _fit(self, lo: float, hi: float) -> None:
+        if not self.width:
+            span = hi - lo
+            self.width = span / (self.bins - 1) if span else max(abs(lo), 1) / self.bins
+            self.origin = lo if span else lo - self.width * self.bins / 2
+        half = self.bins // 2
+        while lo < self.origin or hi >= self.origin + self.width * self.bins:
+            merged = self.hist.reshape(half, 2).sum(axis=1)
+            empty = np.zeros(half, dtype=np.int64)
+            if lo < self.origin:
+                self.hist = np.concatenate([empty, merged])
+                self.origin -= self.width * self.bins
+            else:
+                self.hist = np.concatenate([merged, empty])
+            self.width *= 2
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile from the reservoir."""
+        if not len(self.sample):
+            return math.nan
+        return float(np.quantile(self.sample, q))
+
+    def edges(self) -> tuple:
+        """Histogram bins that hold values, as (left edges, counts, width)."""
+        used = np.nonzero(self.hist)[0]
+        if not len(used):
+            return np.array([]), np.array([]), self.width
+        hist = self.hist[used[0] : used[-1] + 1]
+        left = self.origin + self.width * np.arange(used[0], used[-1] + 1)
+        return left, hist, self.width
+
+
+class OutputStats:
+    """Running statistics of every column of a scan output.
+
+    Fed with batches of result rows while they are written, so a report can
+    be built without reading the output back. Columns in `exclude` (the
+    file path by default) are left out.
+    """
+
+    def __init__(self, bins: int = 64, exclude: tuple = ("file",)) -> None:
+        self.bins = bins
+        self.exclude = set(exclude)
+        self.rows = 0
+        self.columns = {}
+
+    def update(self, rows: list) -> None:
+        """Add a batch of flattened result dicts."""
+        if rows:
+            self.update_frame(pd.DataFrame.from_records(rows))
+
+    def update_frame(self, frame: pd.DataFrame) -> None:
+        """Add a batch of rows loaded as a DataFrame."""
+        for column in frame.columns:
+            if column in self.exclude:
+                continue
+            if column not in self.columns:
+                stats = self.columns[column] = ColumnStats(self.bins)
+                stats.missing = self.rows
+            self.columns[column].update(frame[column])
+        for column, stats in self.columns.items():
+            if column not in frame.columns:
+                stats.missing += len(frame)
+        self.rows += len(frame)
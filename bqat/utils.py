@@ -1,6 +1,5 @@
 import csv
 import datetime
-import json
 import os
 from pathlib import Path
 
@@ -8,7 +7,6 @@ from pathlib import Path
 import pandas as pd
 
 # from PyInquirer import prompt
-from ydata_profiling import ProfileReport
 
 from bqat import __version__ as version
 
@@ -31,82 +29,134 @@ def to_upper(ext_list):
     return ext_list + cap_list
 
 
-def write_report(report_dir, output_dir, title="Biometric Quality Report (BQAT)"):
+class BatchSizer:
+    """Pick the number of files per scan task.
+
+    A fixed `size` is used as is. With `size=0` the batch size is derived
+    from the observed time per file so each task runs for roughly
+    `target` seconds, which amortises the per-task scheduling cost on
+    small images without starving workers on slow ones.
+    """
+
+    def __init__(self, size=0, target=1.0, max_size=64, smoothing=0.3):
+        self.fixed = size > 0
+        self.size = size if self.fixed else 1
+        self.target = target
+        self.max_size = max_size
+        self.smoothing = smoothing
+        self.per_file = None
+
+    @property
+    def calibrated(self):
+        return self.fixed or self.per_file is not None
+
+    def update(self, count, elapsed):
+        if self.fixed or not count:
+            return
+        per_file = elapsed / count
+        if self.per_file is None:
+            self.per_file = per_file
+        else:
+            self.per_file += self.smoothing * (per_file - self.per_file)
+        if self.per_file > 0:
+            size = int(self.target / self.per_file)
+        else:
+            size = self.max_size
+        self.size = max(1, min(self.max_size, size))
+
+
+def write_report(
+    report_dir,
+    output_dir,
+    title="Biometric Quality Report (BQAT)",
+    options=None,
+    stats=None,
+):
+    from bqat.report import (
+        profile,
+        report_data,
+        stream_stats,
+        use_stats,
+        write_stats_report,
+    )
+
+    options = options or {}
     print("\n> Report:")
     if not os.path.exists(report_dir.rsplit("/", 1)[0]):
         os.makedirs(report_dir.rsplit("/", 1)[0])
-    df = pd.read_csv(
-        output_dir,
-        # dtype=np.float32, # force parsing scientific notation string as number type
-    )
+    if use_stats(options, stats):
+        if stats is None:
+            stats = stream_stats(output_dir)
+        print(f"Statistics: {stats.rows} rows, {len(stats.columns)} columns")
+        write_stats_report(stats, report_dir, title)
+        return
+    df, sampling = report_data(output_dir, options)
+    print(f"Sampling: {sampling}")
     df = df.drop(columns="file")
-    ProfileReport(
+    profile(
         df,
-        title=title,
-        samples=None,
-        correlations=None,
-        html={
-            "navbar_show": True,
-            "style": {
-                "full_width": True,
-                "theme": "simplex",
-                "logo": "https://www.biometix.com/wp-content/uploads/2020/10/logo.png",
-            },
-        },
-    ).to_file(report_dir)
-
-
-def write_csv(path, out="", seam=False):
-    path = Path(path)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    temp = path.parent / "header.temp"
-
-    if seam:
-        with open(temp) as f:
-            header = f.read().rstrip().split(",")
-        with open(path) as f:
-            data = f.read()
-        with open(path, "w") as f:
-            writer = csv.DictWriter(f, fieldnames=header)
-            writer.writeheader()
-        with open(path, "a") as f:
-            f.write(data)
-        temp.unlink()
-    else:
-        out = json.loads(pd.json_normalize(out).to_json(orient="index"))["0"]
-        if os.path.exists(temp):
-            with open(temp) as f:
-                header_len = len(f.readline().split(","))
-        else:
-            header_len = 0
-        if header_len < len(list(out.keys())):
-            with open(temp, "w") as f:
-                writer = csv.DictWriter(f, fieldnames=list(out.keys()))
-                writer.writeheader()
-
-        with open(path, "a") as f:
-            writer = csv.DictWriter(f, fieldnames=list(out.keys()))
-            writer.writerow(out)
-
-
-def write_log(path, out=None, init=False, finish=False):
-    if init:
-        if not os.path.exists(path.rsplit("/", 1)[0]):
-            os.makedirs(path.rsplit("/", 1)[0])
-        with open(path, "w") as f:
-            f.write("[")
-    elif finish:
-        with open(path, "rb+") as f:
-            f.seek(-1, os.SEEK_END)
-            if f.read1() == b"[":
-                f.seek(-1, os.SEEK_CUR)
-                f.write(bytes("[]", "utf-8"))
-            else:
-                f.seek(-1, os.SEEK_CUR)
-                f.write(bytes("]", "utf-8"))
-    else:
-        with open(path, "a") as f:
-            f.write(json.dumps(out) + ",")
+        report_dir,
+        title,
+        sampling,
+        options.get("minimal", False),
+        options.get("budget", 0),
+    )
+
+
+def read_output(path, columns=None, compact=False) -> pd.DataFrame:
+    """Load a scan output (CSV or Parquet) with optional column projection.
+
+    With `compact`, rows are loaded in chunks cast to the compact dtypes of
+    the column schema of the output's mode, see `bqat.schema`.
+    """
+    p = Path(path)
+    if compact:
+        from bqat.report import iter_output
+        from bqat.schema import concat_chunks
+
+        return concat_chunks(iter_output(p, columns, compact=True))
+    if p.suffix.casefold() != ".parquet":
+        return pd.read_csv(p, usecols=columns)
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parts = sorted(p.glob("*.parquet")) if p.is_dir() else [p]
+    tables = []
+    for part in parts:
+        names = pq.read_schema(part).names
+        if columns is not None:
+            names = [col for col in columns if col in names]
+        tables.append(pq.read_table(part, columns=names))
+    try:
+        table = pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Parts disagree on a column type, fall back to object columns.
+        data = pd.concat([t.to_pandas() for t in tables], ignore_index=True)
+        return data[[col for col in columns if col in data]] if columns else data
+    if columns is not None:
+        table = table.select([col for col in columns if col in table.column_names])
+    return table.to_pandas()
+
+
+def output_columns(path) -> list:
+    """List the columns of a scan output without loading the rows."""
+    p = Path(path)
+    if p.suffix.casefold() != ".parquet":
+        with open(p) as f:
+            return next(csv.reader(f), [])
+
+    import pyarrow.parquet as pq
+
+    columns = {}
+    for part in sorted(p.glob("*.parquet")) if p.is_dir() else [p]:
+        columns.update(dict.fromkeys(pq.read_schema(part).names))
+    return list(columns)
+
+
+def is_output(path) -> bool:
+    p = Path(path)
+    return p.exists() and p.suffix.casefold() in (".csv", ".parquet")
 
 
 def validate_path(path) -> str:
@@ -223,12 +273,103 @@ def validate_path(path) -> str:
 #     return ans
 
 
-def filter_output(filepath, attributes, query, sort, cwd) -> dict:
+FILTER_CHUNK_ROWS = 100000
+FILTER_BUFFER_ROWS = 1000000  # matching rows sorted in memory before spilling
+
+
+def query_chunks(path, columns=None, query="", chunksize=FILTER_CHUNK_ROWS):
+    """Stream the rows of a scan output that match `query`, chunk by chunk."""
+    from bqat.report import iter_output
+
+    for chunk in iter_output(path, columns, chunksize):
+        yield chunk.query(query) if query and not chunk.empty else chunk
+
+
+def sort_chunks(
+    chunks,
+    keys: list,
+    folder=None,
+    buffer=FILTER_BUFFER_ROWS,
+    chunksize=FILTER_CHUNK_ROWS,
+):
+    """Sort a stream of chunks by `keys`, spilling to disk when it is large.
+
+    Up to `buffer` rows are sorted in memory. Beyond that, each buffer is
+    sorted and saved under `folder` as a run of `chunksize` pieces, and the
+    runs are merged back as one sorted stream reading a piece of each at a
+    time, so memory stays bounded whatever the number of rows.
+    """
+    import heapq
+    import tempfile
+
+    held, runs, rows = [], [], 0
+    with tempfile.TemporaryDirectory(prefix="bqat_sort_", dir=folder) as temp:
+
+        def spill(data: pd.DataFrame) -> None:
+            data = data.sort_values(keys)
+            pieces = []
+            for start in range(0, len(data), chunksize):
+                piece = Path(temp) / f"run_{len(runs)}_{len(pieces)}.pkl"
+                data.iloc[start : start + chunksize].to_pickle(piece)
+                pieces.append(piece)
+            runs.append(pieces)
+
+        for chunk in chunks:
+            held.append(chunk)
+            rows += len(chunk)
+            if rows >= buffer:
+                spill(pd.concat(held, ignore_index=True))
+                held, rows = [], 0
+        data = pd.concat(held, ignore_index=True) if held else pd.DataFrame()
+        if not runs:
+            yield data.sort_values(keys) if not data.empty else data
+            return
+        if not data.empty:
+            spill(data)
+        del data, held
+
+        columns = list(pd.read_pickle(runs[0][0]).columns)
+        positions = [columns.index(key) for key in keys]
+
+        def order(row):
+            # Missing values last, as with `sort_values`.
+            return tuple(
+                (True, 0) if pd.isna(row[i]) else (False, row[i]) for i in positions
+            )
+
+        def read_run(pieces):
+            for piece in pieces:
+                data = pd.read_pickle(piece).reindex(columns=columns)
+                yield from data.itertuples(index=False, name=None)
+
+        batch = []
+        for row in heapq.merge(*(read_run(run) for run in runs), key=order):
+            batch.append(row)
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+
+
+def filter_output(filepath, attributes, query, sort, cwd, options=None) -> dict:
+    from bqat.report import (
+        iter_output,
+        profile,
+        report_data,
+        stream_stats,
+        use_stats,
+        write_stats_report,
+        write_table,
+    )
+
     p = Path(filepath)
     if not (attributes or query or sort):
         return False
-    if not p.is_file() or p.suffix != ".csv":
-        print(f">>> Output [{str(p)}] not valid, please specify a CSV file. exit.")
+    if not is_output(p):
+        print(
+            f">>> Output [{str(p)}] not valid, please specify a CSV or Parquet output. exit."
+        )
         return False
     print("\n> Filtering:")
     dt = datetime.datetime.today()
@@ -238,81 +379,50 @@ def filter_output(filepath, attributes, query, sort, cwd) -> dict:
     output_dir = p.parent / f"filtered_output_{timestamp}.csv"
     pd.set_option("mode.chained_assignment", None)
 
-    if p.exists() and p.suffix in (".csv", ".CSV"):
-        data = pd.read_csv(
-            p,
-            # dtype=np.float32,
-        )
-        pd.set_option("display.max_colwidth", None)
-        if attributes and not data.empty:
+    if is_output(p):
+        cols = None
+        sort_cols = sort.split(",") if sort else []
+        if attributes:
             cols = attributes.split(",")
             cols.insert(0, "file") if "file" not in cols else None
-            data = data[cols]
-        if query and not data.empty:
-            data = data.query(query)
-        if sort and not data.empty:
-            data = data.sort_values(sort.split(","))
-        
-        data.to_csv(output_dir, index=False)
-
-        if not data.empty:
-            ProfileReport(
-                data,
-                title=f"EDA (Filtered) Report (BQAT v{version})",
-                explorative=True,
-                samples=None,
-                # correlations={"cramers": {"calculate": False}},
-                correlations=None,
-                html={
-                    "navbar_show": True,
-                    "style": {
-                        "full_width": True,
-                        "theme": "simplex",
-                        "logo": "https://www.biometix.com/wp-content/uploads/2020/10/logo.png",
-                    },
-                },
-            ).to_file(report_dir)
-
-            with open(table_dir, "w") as f:
-                f.write(
-                    """<!doctype html><html lang=en>           
-                    <head>
-                    <script
-                        src="https://code.jquery.com/jquery-2.2.4.min.js"
-                        integrity="sha256-BbhdlvQf/xTY9gja0Dq3HiwQF8LaCRTXxZKRutelT44="
-                        crossorigin="anonymous">
-                    </script>
-                    <script src="https://cdn.datatables.net/1.13.1/js/jquery.dataTables.min.js"></script>
-                    <link href="https://cdn.datatables.net/1.13.1/css/jquery.dataTables.min.css" rel="stylesheet">
-                    <link href="https://cdn.datatables.net/1.10.16/css/jquery.dataTables.min.css" rel="stylesheet">
-                    </head>
-                    <body>
-                    <script>
-                        $(document)
-                    .ready(function () {
-                        $('table')
-                        .DataTable( {
-                    fixedColumns: {
-                            left: 2
-                        }
-                    }
-                        );
-                    });
-                    </script>
-                    """
+            # Only load what the selection, the query and the sort refer to.
+            columns = [
+                col
+                for col in output_columns(p)
+                if col in cols or col in sort_cols or (query and col in query)
+            ]
+        else:
+            columns = None
+
+        chunks = query_chunks(p, columns, query)
+        if sort_cols:
+            chunks = sort_chunks(chunks, sort_cols, p.parent)
+        header = cols or columns or output_columns(p)
+        rows = 0
+        with open(output_dir, "w", newline="") as f:
+            for i, chunk in enumerate(chunks):
+                chunk.reindex(columns=header).to_csv(f, index=False, header=not i)
+                rows += len(chunk)
+
+        if rows:
+            options = options or {}
+            title = f"EDA (Filtered) Report (BQAT v{version})"
+            if use_stats(options):
+                write_stats_report(stream_stats(output_dir), report_dir, title)
+            else:
+                sample, sampling = report_data(output_dir, options)
+                profile(
+                    sample,
+                    report_dir,
+                    title,
+                    sampling,
+                    options.get("minimal", False),
+                    options.get("budget", 0),
+                    explorative=True,
                 )
-                data["file"] = data["file"].map(lambda x: f"file://{cwd}/{x}")
-
-                def make_clickable(val):
-                    # target _blank to open new window
-                    return '<a target="_blank" href="{}">{}</a>'.format(val, val)
+                del sample
 
-                f.write(
-                    data.style.format({"file": make_clickable})
-                    .background_gradient(axis=0)
-                    .to_html()
-                    # .to_html(render_links=True)
-                )
+            write_table(iter_output(output_dir), table_dir, cwd)
         else:
             return False
         
@@ -323,7 +433,7 @@ def filter_output(filepath, attributes, query, sort, cwd) -> dict:
         }
 
     else:
-        raise RuntimeError("output csv not fount.")
+        raise RuntimeError("output not fount.")
 
 
 def glob_path(path: str, ext: list, recursive: bool = True) -> list:
@@ -333,10 +443,22 @@ def glob_path(path: str, ext: list, recursive: bool = True) -> list:
         return [i for e in extend(ext) for i in list(Path(path).glob(f"*.{e}"))]
 
 
-def generate_report(filepath, cwd='') -> dict:
+def generate_report(filepath, cwd='', options=None) -> dict:
+    from bqat.report import (
+        iter_output,
+        profile,
+        report_data,
+        stream_stats,
+        use_stats,
+        write_stats_report,
+        write_table,
+    )
+
     p = Path(filepath)
-    if not p.is_file() or p.suffix != ".csv":
-        print(f">>> Input [{str(p)}] not valid, please specify a CSV file. exit.")
+    if not is_output(p):
+        print(
+            f">>> Input [{str(p)}] not valid, please specify a CSV or Parquet output. exit."
+        )
         return False
     print("\n> Reporting:")
     dt = datetime.datetime.today()
@@ -345,75 +467,35 @@ def generate_report(filepath, cwd='') -> dict:
     report_dir = p.parent / f"eda_report_{timestamp}.html"
     pd.set_option("mode.chained_assignment", None)
 
-    if p.exists() and p.suffix in (".csv", ".CSV"):
-        data = pd.read_csv(
-            p,
-            # dtype=np.float32,
-        )
+    if is_output(p):
         pd.set_option("display.max_colwidth", None)
-
-        if not data.empty:
-            ProfileReport(
+        options = options or {}
+        title = f"EDA Report (BQAT v{version})"
+        if use_stats(options):
+            stats = stream_stats(p)
+            if not stats.rows:
+                return False
+            write_stats_report(stats, report_dir, title)
+        else:
+            # Compact dtypes only for profiling, the table shows the values as written.
+            data, sampling = report_data(p, options)
+            if data.empty:
+                return False
+            print(f"Sampling: {sampling}")
+            profile(
                 data,
-                title=f"EDA Report (BQAT v{version})",
+                report_dir,
+                title,
+                sampling,
+                options.get("minimal", False),
+                options.get("budget", 0),
                 explorative=True,
-                samples=None,
-                # correlations={"cramers": {"calculate": False}},
-                correlations=None,
-                html={
-                    "navbar_show": True,
-                    "style": {
-                        "full_width": True,
-                        "theme": "simplex",
-                        "logo": "https://www.biometix.com/wp-content/uploads/2020/10/logo.png",
-                    },
-                },
-            ).to_file(report_dir)
-
-            with open(table_dir, "w") as f:
-                f.write(
-                    """<!doctype html><html lang=en>           
-                    <head>
-                    <script
-                        src="https://code.jquery.com/jquery-2.2.4.min.js"
-                        integrity="sha256-BbhdlvQf/xTY9gja0Dq3HiwQF8LaCRTXxZKRutelT44="
-                        crossorigin="anonymous">
-                    </script>
-                    <script src="https://cdn.datatables.net/1.13.1/js/jquery.dataTables.min.js"></script>
-                    <link href="https://cdn.datatables.net/1.13.1/css/jquery.dataTables.min.css" rel="stylesheet">
-                    <link href="https://cdn.datatables.net/1.10.16/css/jquery.dataTables.min.css" rel="stylesheet">
-                    </head>
-                    <body>
-                    <script>
-                        $(document)
-                    .ready(function () {
-                        $('table')
-                        .DataTable( {
-                    fixedColumns: {
-                            left: 2
-                        }
-                    }
-                        );
-                    });
-                    </script>
-                    """
-                )
-                data["file"] = data["file"].map(lambda x: f"file://{cwd}/{x}")
-
-                def make_clickable(val):
-                    # target _blank to open new window
-                    return '<a target="_blank" href="{}">{}</a>'.format(val, val)
+            )
+            del data
 
-                f.write(
-                    data.style.format({"file": make_clickable})
-                    .background_gradient(axis=0)
-                    .to_html()
-                    # .to_html(render_links=True)
-                )
-        else:
-            return False
+        write_table(iter_output(p), table_dir, cwd)
 
         return {"table": str(table_dir), "report": str(report_dir)}
 
     else:
-        raise RuntimeError("input csv not fount.")
\ No newline at end of file
+        raise RuntimeError("input not fount.")
\ No newline at end of file
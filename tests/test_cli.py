@@ -1,10 +1,18 @@
 import csv
 import glob
 import json
+import math
+import os
 import shutil
+import threading
+import time
 from zipfile import ZipFile
 
-from bqat.app import filter, run
+from bqat.app import filter, merge, report, run
+from bqat.cache import ResultCache
+from bqat.executor import ProcessExecutor, TaskSupervisor, ThreadExecutor
+from bqat.sink import CsvWriter, ResultSink
+from bqat.utils import read_output
 
 
 def test_face_normal_default(tmp_path):
@@ -412,3 +420,834 @@ def test_speech_batch(tmp_path):
         if path.endswith(".json"):
             with open(path) as f:
                 assert list(json.loads(f.read()).keys()) == ["metadata", "log"]
+
+
+def test_finger_jsonl_log(tmp_path):
+    """
+    GIVEN a set of mock fingerprint images
+    WHEN the images processed with JSON Lines log format
+    THEN check if the log entries and the metadata are written separately
+    """
+    samples = "tests/samples/finger.zip"
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+
+    run(
+        mode="finger",
+        input_folder=str(input_dir),
+        output_folder=str(output_dir),
+        reporting=False,
+        limit=10,
+        pattern="*",
+        single=False,
+        type=["wsq", "jpg", "jpeg", "png", "bmp", "jp2"],
+        convert="",
+        target="",
+        attributes="",
+        query="",
+        sort="",
+        cwd="",
+        engine="bqat",
+        debugging=False,
+        log_format="jsonl",
+    )
+
+    logs = glob.glob(str(output_dir) + "/*.jsonl")
+    metadata = glob.glob(str(output_dir) + "/*.meta.json")
+
+    assert len(logs) == 1
+    assert len(metadata) == 1
+
+    with open(logs[0]) as f:
+        entries = [json.loads(line) for line in f]
+    with open(metadata[0]) as f:
+        meta = json.load(f)
+        assert list(meta.keys()) == ["metadata", "log"]
+        assert meta["metadata"]["log"] == len(entries)
+        assert meta["metadata"]["failed"] == len(
+            [entry for entry in entries if entry.get("load image")]
+        )
+
+
+def test_finger_parquet_output(tmp_path):
+    """
+    GIVEN a set of mock fingerprint images
+    WHEN the images processed with Parquet output format
+    THEN check if the output can be filtered natively
+    """
+    samples = "tests/samples/finger.zip"
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+
+    run(
+        mode="finger",
+        input_folder=str(input_dir),
+        output_folder=str(output_dir),
+        reporting=False,
+        limit=10,
+        pattern="*",
+        single=False,
+        type=["wsq", "jpg", "jpeg", "png", "bmp", "jp2"],
+        convert="",
+        target="",
+        attributes="",
+        query="",
+        sort="",
+        cwd="",
+        engine="bqat",
+        debugging=False,
+        output_format="parquet",
+    )
+
+    outputs = glob.glob(str(output_dir) + "/*.parquet")
+
+    assert len(outputs) == 1
+    assert len(glob.glob(outputs[0] + "/*.parquet")) >= 1
+
+    dir = filter(outputs[0], attributes="NFIQ2", query="NFIQ2>10", sort="", cwd="")
+    with open(dir.get("output")) as f:
+        assert f.readline().rstrip() == "file,NFIQ2"
+
+
+def test_finger_resume(tmp_path):
+    """
+    GIVEN an output of an interrupted fingerprint job
+    WHEN the job resumed from that output
+    THEN check if only the remaining files are appended to it
+    """
+    samples = "tests/samples/finger.zip"
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+
+    args = dict(
+        mode="finger",
+        input_folder=str(input_dir),
+        output_folder=str(output_dir),
+        reporting=False,
+        pattern="*",
+        single=False,
+        type=["wsq", "jpg", "jpeg", "png", "bmp", "jp2"],
+        convert="",
+        target="",
+        attributes="",
+        query="",
+        sort="",
+        cwd="",
+        engine="bqat",
+        debugging=False,
+    )
+    run(limit=3, **args)
+    output = glob.glob(str(output_dir) + "/*.csv")[0]
+    with open(output) as f:
+        done = {row["file"] for row in csv.DictReader(f)}
+    pending = next(
+        str(path)
+        for path in sorted(input_dir.rglob("*.*"))
+        if str(path) not in done and path.suffix[1:] in args["type"]
+    )
+    with open(output, "a") as f:
+        f.write(f"{pending},")  # a row cut short by the interruption
+    run(limit=0, resume=output, **args)
+
+    assert len(glob.glob(str(output_dir) + "/*.csv")) == 1
+
+    with open(output) as f:
+        files = [row["file"] for row in csv.DictReader(f)]
+    assert len(files) == len(set(files))
+    assert pending in files
+
+
+def test_finger_incremental(tmp_path):
+    """
+    GIVEN a fingerprint job run in incremental mode
+    WHEN a sample deleted, another modified and the job run again
+    THEN check if the same output is updated with one row per remaining sample
+    """
+    samples = "tests/samples/finger.zip"
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+
+    args = dict(
+        mode="finger",
+        input_folder=str(input_dir),
+        output_folder=str(output_dir),
+        reporting=False,
+        limit=0,
+        pattern="*",
+        single=False,
+        type=["wsq", "jpg", "jpeg", "png", "bmp", "jp2"],
+        convert="",
+        target="",
+        attributes="",
+        query="",
+        sort="",
+        cwd="",
+        engine="bqat",
+        debugging=False,
+        incremental=True,
+    )
+    run(**args)
+    output = glob.glob(str(output_dir) + "/*.csv")[0]
+    with open(output) as f:
+        deleted, modified = [row["file"] for row in csv.DictReader(f)][:2]
+    os.remove(deleted)
+    with open(modified, "ab") as f:
+        f.write(b"\0")
+    run(**args)
+
+    assert glob.glob(str(output_dir) + "/*.csv") == [output]
+
+    with open(output) as f:
+        files = [row["file"] for row in csv.DictReader(f)]
+    assert deleted not in files
+    assert modified in files
+    assert len(files) == len(set(files))
+
+
+def test_finger_shard_merge(tmp_path, capsys):
+    """
+    GIVEN a fingerprint job split into shards
+    WHEN the shard outputs merged
+    THEN check if every sample is in the merged output exactly once
+    """
+    samples = "tests/samples/finger.zip"
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+
+    args = dict(
+        mode="finger",
+        input_folder=str(input_dir),
+        output_folder=str(output_dir),
+        reporting=False,
+        limit=0,
+        pattern="*",
+        single=False,
+        type=["wsq", "jpg", "jpeg", "png", "bmp", "jp2"],
+        convert="",
+        target="",
+        attributes="",
+        query="",
+        sort="",
+        cwd="",
+        engine="bqat",
+        debugging=False,
+    )
+    for index in range(3):
+        run(shard=(index, 3), **args)
+    first = glob.glob(str(output_dir) + "/output_*_shard-0-of-3.csv")
+    assert len(glob.glob(str(output_dir) + "/output_*_shard-*.csv")) == 3
+    time.sleep(1)  # outputs are named by the second
+    run(shard=(0, 3), **args)  # a shard run twice is only merged once
+    rerun = set(glob.glob(str(output_dir) + "/output_*_shard-0-of-3.csv")) - set(first)
+    os.utime(first[0])  # copied in later, the run time in its name still wins
+
+    capsys.readouterr()
+    merged = merge(str(output_dir), str(tmp_path / "merged"), reporting=False)
+    assert (
+        f"using the newest: {os.path.basename(rerun.pop())}" in capsys.readouterr().out
+    )
+
+    with open(merged["output"]) as f:
+        files = [row["file"] for row in csv.DictReader(f)]
+    assert len(files) == len(set(files))
+    assert len(files) == len(glob.glob(str(input_dir) + "/**/*.*", recursive=True))
+
+
+def test_speech_shard_merge(tmp_path):
+    """
+    GIVEN a folder of speech samples split into shards
+    WHEN the shard outputs merged
+    THEN check if every sample is scored by one shard only
+    """
+    samples = "tests/samples/speech.zip"
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+    input_file = str(list(input_dir.glob("**/*.wav"))[0])
+    for index in range(8):
+        shutil.copy(input_file, input_dir / f"input_file_{index}.wav")
+
+    for index in range(2):
+        run(
+            mode="speech",
+            input_folder=str(input_dir),
+            output_folder=str(output_dir),
+            reporting=False,
+            limit=0,
+            pattern="*",
+            single=False,
+            type=["wav"],
+            convert="",
+            target="",
+            attributes="",
+            query="",
+            sort="",
+            cwd="",
+            engine="bqat",
+            debugging=False,
+            shard=(index, 2),
+        )
+
+    merged = merge(str(output_dir), str(tmp_path / "merged"), reporting=False)
+
+    with open(merged["output"]) as f:
+        files = [row["file"] for row in csv.DictReader(f)]
+    assert len(files) == len(set(files))
+    assert len(files) == len(list(input_dir.glob("**/*.wav")))
+
+
+def test_finger_backends(tmp_path):
+    """
+    GIVEN a set of fingerprint samples
+    WHEN the job run on different execution backends
+    THEN check if the outputs contain the same samples
+    """
+    samples = "tests/samples/finger.zip"
+    input_dir = tmp_path / "input"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+
+    files = {}
+    for backend in ("serial", "thread", "process"):
+        output_dir = tmp_path / backend
+        run(
+            mode="finger",
+            input_folder=str(input_dir),
+            output_folder=str(output_dir),
+            reporting=False,
+            limit=0,
+            pattern="*",
+            single=False,
+            type=["wsq", "jpg", "jpeg", "png", "bmp", "jp2"],
+            convert="",
+            target="",
+            attributes="",
+            query="",
+            sort="",
+            cwd="",
+            engine="bqat",
+            debugging=False,
+            backend=backend,
+        )
+        output = glob.glob(str(output_dir) + "/*.csv")[0]
+        with open(output) as f:
+            files[backend] = sorted(row["file"] for row in csv.DictReader(f))
+
+    assert files["serial"]
+    assert files["serial"] == files["thread"] == files["process"]
+
+
+def test_finger_report_sample(tmp_path):
+    """
+    GIVEN a set of fingerprint samples
+    WHEN the report is generated from a capped row sample
+    THEN check if the report states the sampling used
+    """
+    samples = "tests/samples/finger.zip"
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+
+    run(
+        mode="finger",
+        input_folder=str(input_dir),
+        output_folder=str(output_dir),
+        reporting=True,
+        limit=0,
+        pattern="*",
+        single=False,
+        type=["wsq", "jpg", "jpeg", "png", "bmp", "jp2"],
+        convert="",
+        target="",
+        attributes="",
+        query="",
+        sort="",
+        cwd="",
+        engine="bqat",
+        debugging=False,
+        report_options={"sample": 2, "sampling": "stratified", "minimal": True},
+    )
+
+    output = glob.glob(str(output_dir) + "/*.csv")[0]
+    with open(output) as f:
+        rows = len(list(csv.DictReader(f)))
+    report = glob.glob(str(output_dir) + "/*.html")[0]
+    with open(report) as f:
+        html = f.read()
+    assert rows > 2
+    assert f"Stratified (by parent folder) sample of 2 out of {rows} rows" in html
+
+
+def test_finger_report_stream(tmp_path):
+    """
+    GIVEN a set of fingerprint samples
+    WHEN the report is built from statistics gathered during the run
+    THEN check if the report covers every numeric column of the output
+    """
+    samples = "tests/samples/finger.zip"
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+
+    run(
+        mode="finger",
+        input_folder=str(input_dir),
+        output_folder=str(output_dir),
+        reporting=True,
+        limit=0,
+        pattern="*",
+        single=False,
+        type=["wsq", "jpg", "jpeg", "png", "bmp", "jp2"],
+        convert="",
+        target="",
+        attributes="",
+        query="",
+        sort="",
+        cwd="",
+        engine="bqat",
+        debugging=False,
+        report_options={"engine": "stream"},
+    )
+
+    output = glob.glob(str(output_dir) + "/*.csv")[0]
+    with open(output) as f:
+        reader = csv.DictReader(f)
+        rows = len(list(reader))
+        columns = [col for col in reader.fieldnames if col != "file"]
+    report = glob.glob(str(output_dir) + "/*.html")[0]
+    with open(report) as f:
+        html = f.read()
+    assert f"All {rows:,} rows" in html
+    assert all(f"<td>{col}</td>" in html for col in columns)
+
+
+def test_finger_report_table(tmp_path):
+    """
+    GIVEN a fingerprint output
+    WHEN the standalone report is generated
+    THEN check if the table viewer works offline with its rows in page files
+    """
+    samples = "tests/samples/finger.zip"
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+
+    run(
+        mode="finger",
+        input_folder=str(input_dir),
+        output_folder=str(output_dir),
+        reporting=False,
+        limit=0,
+        pattern="*",
+        single=False,
+        type=["wsq", "jpg", "jpeg", "png", "bmp", "jp2"],
+        convert="",
+        target="",
+        attributes="",
+        query="",
+        sort="",
+        cwd="",
+        engine="bqat",
+        debugging=False,
+    )
+
+    output = glob.glob(str(output_dir) + "/*.csv")[0]
+    table = report(output, "", {"engine": "stream"}).get("table")
+    with open(table) as f:
+        html = f.read()
+    assert html.startswith("<!doctype html>")
+    assert "https://" not in html
+    pages = glob.glob(table[: -len(".html")] + "_pages/page_*.js")
+    assert pages
+    with open(sorted(pages)[0]) as f:
+        assert f.read().startswith("bqatPage(0, [[")
+
+
+def test_filter_parquet_sorted(tmp_path):
+    """
+    GIVEN a Parquet fingerprint output
+    WHEN it is filtered with a query and a sort
+    THEN check if the filtered CSV is sorted and holds only the selected columns
+    """
+    samples = "tests/samples/finger.zip"
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+
+    run(
+        mode="finger",
+        input_folder=str(input_dir),
+        output_folder=str(output_dir),
+        reporting=False,
+        limit=0,
+        pattern="*",
+        single=False,
+        type=["wsq", "jpg", "jpeg", "png", "bmp", "jp2"],
+        convert="",
+        target="",
+        attributes="",
+        query="",
+        sort="",
+        cwd="",
+        engine="bqat",
+        debugging=False,
+        output_format="parquet",
+    )
+
+    output = glob.glob(str(output_dir) + "/*.parquet")[0]
+    dir = filter(output, attributes="NFIQ2", query="NFIQ2>0", sort="NFIQ2", cwd="")
+    with open(dir.get("output")) as f:
+        reader = csv.DictReader(f)
+        scores = [float(row["NFIQ2"]) for row in reader]
+    assert reader.fieldnames == ["file", "NFIQ2"]
+    assert scores and scores == sorted(scores)
+
+
+def test_finger_compact_dtypes(tmp_path):
+    """
+    GIVEN a fingerprint output
+    WHEN it is loaded for report or filter
+    THEN check if metric columns get compact types without changing values
+    """
+    samples = "tests/samples/finger.zip"
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+
+    run(
+        mode="finger",
+        input_folder=str(input_dir),
+        output_folder=str(output_dir),
+        reporting=False,
+        limit=0,
+        pattern="*",
+        single=False,
+        type=["wsq", "jpg", "jpeg", "png", "bmp", "jp2"],
+        convert="",
+        target="",
+        attributes="",
+        query="",
+        sort="",
+        cwd="",
+        engine="bqat",
+        debugging=False,
+    )
+
+    output = glob.glob(str(output_dir) + "/*.csv")[0]
+    data = read_output(output)
+    compact = read_output(output, compact=True)
+    assert compact["NFIQ2"].dtype.itemsize == 1
+    assert compact["file"].tolist() == data["file"].tolist()
+    assert compact.memory_usage(deep=True).sum() < data.memory_usage(deep=True).sum()
+    for col in data.columns:
+        if data[col].dtype.kind == "f":
+            assert compact[col].dtype.itemsize <= 4
+            error = (compact[col].astype(float) - data[col]).abs().fillna(0)
+            assert (error <= 1e-6 * data[col].abs().clip(lower=1)).all()
+
+
+def test_filter_precision(tmp_path):
+    """
+    GIVEN a scan output with values beyond float32 precision
+    WHEN the output filtered and its table written
+    THEN check if the values are written and compared as they are in the output
+    """
+    output = tmp_path / "output_finger_1-1-2024_0-0-0.csv"
+    with open(output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["file", "NFIQ2", "Score"])
+        writer.writerow(["a.png", 40, 0.1234567891])
+        writer.writerow(["b.png", 50, 16777217.25])
+
+    dir = filter(
+        str(output),
+        attributes="Score",
+        query="Score > 16777216.5",
+        sort="",
+        cwd="",
+        report_options={"engine": "stream"},
+    )
+    with open(dir.get("output")) as f:
+        rows = list(csv.DictReader(f))
+    assert [row["Score"] for row in rows] == ["16777217.25"]
+
+    pages = glob.glob(dir.get("table")[: -len(".html")] + "_pages/*.js")
+    with open(pages[0]) as f:
+        assert "16777217.25" in f.read()
+
+
+def test_sink_write_failure(tmp_path):
+    """
+    GIVEN results with a column of mixed types and a batch that fails to write
+    WHEN they are written to a Parquet output
+    THEN check if the mixed column is kept and later results and logs still written
+    """
+    output = tmp_path / "output_finger_1-1-2024_0-0-0.parquet"
+    sink = ResultSink(output, tmp_path / "log.json", output_format="parquet", buffer=1)
+    write, calls = sink.output.write, []
+
+    def fail_once(rows):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        write(rows)
+
+    sink.output.write = fail_once
+    sink.write([{"file": "a.png", "Score": 1}, {"file": "b.png", "Score": "n/a"}])
+    sink.write([{"file": "c.png", "Score": 2}], [{"file": "c.png"}])
+    sink.write([{"file": "d.png", "Score": 3}], [{"file": "d.png"}])
+    try:
+        sink.close()
+    except RuntimeError as e:
+        assert "1 results not written" in str(e)
+    else:
+        assert False, "lost results not reported"
+    sink.log.close({})
+
+    data = read_output(output)
+    assert sorted(data["file"]) == ["a.png", "b.png", "d.png"]
+    assert sorted(data["Score"].astype(str)) == ["1", "3", "n/a"]
+    assert sink.log.entries == 2
+
+
+calls = {}
+release = threading.Event()
+
+
+def score(batch: list) -> list:
+    """Mock scan task: files named hang* block, crash* kill the worker."""
+    for path in batch:
+        calls[path] = calls.get(path, 0) + 1
+        if path.startswith("hang"):
+            release.wait(10)
+        if path.startswith("crash"):
+            os._exit(1)
+        if path.startswith("slow") and calls[path] == 1:
+            release.wait(10)
+            return ["first"]
+    return batch
+
+
+class StoppableExecutor(ThreadExecutor):
+    """Thread backend that lets the supervisor give up on hung tasks."""
+
+    def kill(self, handle) -> list:
+        return []
+
+
+def supervise(executor, batches, **options) -> dict:
+    calls.clear()
+    release.clear()
+    supervisor = TaskSupervisor(executor, score, **options)
+    for batch in batches:
+        supervisor.submit(batch)
+    supervisor.draining = True
+    finished = {}
+    try:
+        while supervisor.pending:
+            for batch, value, error in supervisor.collect():
+                finished.setdefault(tuple(batch), []).append(error or value)
+    finally:
+        release.set()
+        executor.shutdown()
+    return finished
+
+
+def test_supervisor_timeout():
+    """
+    GIVEN a batch holding a file that hangs
+    WHEN the batch runs past its deadline
+    THEN check if the other files are scored and the hung file is quarantined
+    """
+    finished = supervise(
+        StoppableExecutor(8), [["a", "hang", "b"], ["c"]], timeout=0.2, retries=2
+    )
+
+    assert finished[("a",)] == [["a"]]
+    assert finished[("b",)] == [["b"]]
+    assert finished[("c",)] == [["c"]]
+    assert finished[("hang",)] == ["timed out after 0.2s"]
+    assert calls["hang"] == 1 + 3  # in its batch, then alone up to `retries` times
+
+
+def test_supervisor_broken_pool():
+    """
+    GIVEN a batch holding a file that crashes its worker process
+    WHEN the crash breaks the process pool
+    THEN check if the pool is replaced, every other file scored and the culprit quarantined
+    """
+    batches = [["a", "b", "crash", "e"], ["c", "f"], ["d", "g"], ["h"]]
+    finished = supervise(ProcessExecutor(2), batches, retries=1)
+
+    assert finished.pop(("crash",))[0].startswith("worker failed")
+    scored = [path for values in finished.values() for path in values[0]]
+    assert sorted(scored) == ["a", "b", "c", "d", "e", "f", "g", "h"]
+    # Innocent batches are cleared whole, only the culprit's batch is bisected.
+    assert ("c", "f") in finished or ("d", "g") in finished
+
+
+def test_supervisor_speculative():
+    """
+    GIVEN a straggler among quick batches
+    WHEN speculative execution is on
+    THEN check if a copy of the straggler runs and only its first result is kept
+    """
+    start = time.monotonic()
+    finished = supervise(
+        StoppableExecutor(4), [["x"], ["y"], ["z"], ["slow"]], speculative=True
+    )
+
+    assert calls["slow"] == 2
+    assert finished[("slow",)] == [["slow"]]
+    assert time.monotonic() - start < 10
+
+
+def test_cache_key_scope(tmp_path):
+    """
+    GIVEN the same sample content under two paths
+    WHEN cache keys made for it with different scan settings
+    THEN check if the content is shared and the settings kept apart
+    """
+    first, second = tmp_path / "a.png", tmp_path / "b" / "a.png"
+    second.parent.mkdir()
+    first.write_bytes(b"sample")
+    second.write_bytes(b"sample")
+
+    key = ResultCache.key(first, "face", "bqat")
+    assert ResultCache.key(second, "face", "bqat") == key
+    assert ResultCache.key(first, "face", "ofiq") != key
+    assert ResultCache.key(first, "finger", "bqat") != key
+    assert ResultCache.key(first, "face", "bqat", "png") != key
+
+
+def test_cache_rebind(tmp_path):
+    """
+    GIVEN a result cached for a sample
+    WHEN a copy of the sample looked up under another path
+    THEN check if the cached result and logs point to the new path
+    """
+    cache = ResultCache(tmp_path / "cache")
+    cache.put("k", {"file": "old.png", "Quality": 7}, [{"file": "old.png", "x": 1}])
+
+    result, logs = cache.get("k", "new.png")
+    assert result == {"file": "new.png", "Quality": 7}
+    assert logs == [{"file": "new.png", "x": 1}]
+    assert cache.get("missing", "new.png") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_cache_eviction(tmp_path):
+    """
+    GIVEN a cache grown past its size limit
+    WHEN it is evicted
+    THEN check if the least recently used entries go first, counting pending hits
+    """
+    cache = ResultCache(tmp_path / "cache", max_size=0, refresh=0)
+    for key in "abc":
+        cache.put(key, {"file": key}, [])
+        time.sleep(0.01)
+    size = cache._db.execute("SELECT size FROM results").fetchone()[0]
+    cache.max_size = 2 * size
+    cache.get("a", "a")  # only pending until the next flush
+
+    cache.evict()
+    assert cache.get("a", "a") is not None
+    assert cache.get("b", "b") is None
+    assert cache.get("c", "c") is not None
+    cache.close()
+
+
+def test_finger_cache_limit(tmp_path):
+    """
+    GIVEN a fingerprint job with a result cache
+    WHEN the job finishes with the cache over its size limit
+    THEN check if the cache is evicted down to the limit
+    """
+    samples = "tests/samples/finger.zip"
+    input_dir = tmp_path / "input"
+    with ZipFile(samples, "r") as z:
+        z.extractall(input_dir)
+
+    run(
+        mode="finger",
+        input_folder=str(input_dir),
+        output_folder=str(tmp_path / "output"),
+        reporting=False,
+        limit=0,
+        pattern="*",
+        single=False,
+        type=["wsq", "jpg", "jpeg", "png", "bmp", "jp2"],
+        convert="",
+        target="",
+        attributes="",
+        query="",
+        sort="",
+        cwd="",
+        engine="bqat",
+        debugging=False,
+        cache=str(tmp_path / "cache"),
+        cache_size=0,
+    )
+
+    cache = ResultCache(tmp_path / "cache")
+    assert cache._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 0
+    cache.close()
+
+
+def test_csv_writer_append(tmp_path):
+    """
+    GIVEN an existing CSV output
+    WHEN rows with a missing column and with a new column appended to it
+    THEN check if every value lands under its own column
+    """
+    output = tmp_path / "output_finger_1-1-2024_0-0-0.csv"
+    with open(output, "w", newline="") as f:
+        f.write("file,x,y,z\na,1,2,3\n")
+
+    writer = CsvWriter(output)
+    writer.write([{"file": "b", "x": 10, "z": 30}])
+    writer.write([{"file": "c", "x": 100, "y": 200, "z": 300, "w": 400}])
+    writer.close()
+
+    data = read_output(output).set_index("file")
+    assert list(data.columns) == ["x", "y", "z", "w"]
+    assert data.loc["b", "z"] == 30 and math.isnan(data.loc["b", "y"])
+    assert data.loc["c", "w"] == 400 and data.loc["c", "y"] == 200
+    assert math.isnan(data.loc["a", "w"])
+
+
+def test_report_budget(tmp_path):
+    """
+    GIVEN a report time budget too short to profile anything
+    WHEN the report profiled
+    THEN check if it gives up with no half-written report left behind
+    """
+    import pandas as pd
+
+    from bqat.report import profile
+
+    path = tmp_path / "report.html"
+    try:
+        profile(pd.DataFrame({"a": [1, 2, 3]}), path, "Report", budget=0.1)
+    except TimeoutError:
+        pass
+    else:
+        assert False, "budget not enforced"
+    assert not path.exists()